@@ -0,0 +1,93 @@
+"""
+Bounded in-process caches shared by the model wrappers.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+    
+    Exposes the ``get``/``set`` subset of ``diskcache.Cache`` so callers can
+    swap in a persistent store without changing their lookup code.
+    
+    Attributes:
+        maxsize (int): Maximum number of entries kept; 0 disables caching
+        hits (int): Number of successful lookups
+        misses (int): Number of failed lookups
+    """
+    
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Look up a key, marking it as most recently used.
+        
+        Args:
+            key (Hashable): Cache key
+            default (Optional[Any]): Value returned on a miss
+            
+        Returns:
+            Any: The cached value or ``default``
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+        
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to store
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache usage.
+        
+        Returns:
+            Dict[str, int]: Hits, misses, current size and maximum size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -2,14 +2,41 @@ from sentence_transformers import CrossEncoder
 from transformers import AutoTokenizer
 import torch
 import numpy as np
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 import logging
 from tqdm import tqdm
+import os
+import hashlib
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+from cache import LRUCache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class BatchScoringError(RuntimeError):
+    """Raised when every batch of a scoring call failed."""
+
+# Per-process encoder used by multi-instance CPU workers
+_WORKER_ENCODER = None
+
+def _init_worker(init_kwargs: dict, threads: int, core_queue) -> None:
+    """Pin a worker process to its core subset and load its own model."""
+    global _WORKER_ENCODER
+    cores = core_queue.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    _WORKER_ENCODER = UMLS_CrossEncoder(**init_kwargs)
+
+def _score_chunk(pairs: List[Tuple[str, str]]) -> np.ndarray:
+    """Score a chunk of pairs inside a worker process."""
+    return _WORKER_ENCODER._score_pairs(pairs)
+
 class UMLS_CrossEncoder:
     """
     Cross-encoder model for scoring UMLS concept pairs.
@@ -22,7 +49,22 @@ class UMLS_CrossEncoder:
         max_length (int): Maximum sequence length for tokenization
         batch_size (int): Batch size for inference
         device (str): Device to run the model on ('cuda' or 'cpu')
+        backend (str): Inference backend ('torch', 'onnx' or 'openvino')
+        torch_dtype (torch.dtype): Precision of the torch backend weights
+        quantize (bool): Whether Linear layers run with INT8 dynamic quantization
+        cache_dir (Optional[str]): Directory of the persistent score cache, if any
+        num_instances (int): Number of CPU worker processes used for large inputs
+        compile_model (bool): Whether the torch forward is captured with torch.compile
     """
+
+    SUPPORTED_BACKENDS = ("torch", "onnx", "openvino")
+    DTYPES = {"fp32": torch.float32, "fp16": torch.float16, "bf16": torch.bfloat16}
+    # Short-pair batches may grow up to this multiple of batch_size
+    MAX_BATCH_SCALE = 4
+    # Sequence lengths compiled graphs are specialized on
+    SEQ_BUCKETS = (64, 128, 256, 512)
+    # Tokenized batches the GPU pipeline may queue ahead of the forward pass
+    PIPELINE_DEPTH = 4
     
     def __init__(
         self,
@@ -30,62 +72,172 @@ class UMLS_CrossEncoder:
         max_length: int = 512,
         batch_size: int = 16,
         device: Optional[str] = None,
-        max_chars: int = 500
+        max_chars: int = 500,
+        backend: str = "torch",
+        export_dir: Optional[str] = None,
+        dtype: Optional[str] = None,
+        quantize: bool = False,
+        cache_dir: Optional[str] = None,
+        cache_size: int = 10000,
+        num_instances: int = 1,
+        threads_per_instance: Optional[int] = None,
+        compile_model: bool = False
     ):
+        if backend not in self.SUPPORTED_BACKENDS:
+            raise ValueError(
+                f"Unsupported backend '{backend}', expected one of {self.SUPPORTED_BACKENDS}"
+            )
+
         self.model_name = model_name
         self.max_length = max_length
         self.batch_size = batch_size
         self.max_chars = max_chars
+        self.backend = backend
+        self.export_dir = export_dir
+        self.cache_dir = cache_dir
+        
+        # Scores keyed by (model config, query, relation); persistent when cache_dir is set
+        self._cache = diskcache.Cache(cache_dir) if cache_dir else LRUCache(cache_size)
+        
+        # Workers reload the same model; the parent process owns the score cache
+        self.num_instances = num_instances
+        self.threads_per_instance = threads_per_instance
+        self._pool = None
+        self._worker_kwargs = dict(
+            model_name=model_name, max_length=max_length, batch_size=batch_size,
+            device="cpu", max_chars=max_chars, backend=backend, export_dir=export_dir,
+            dtype=dtype, quantize=quantize, cache_size=0, compile_model=compile_model
+        )
         
         # Set device
         if device is None:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
         else:
             self.device = device
+        self.torch_dtype = self._resolve_dtype(dtype)
+        self.quantize = quantize and self._can_quantize()
+        self.compile_model = compile_model and backend == "torch"
+        self._buckets = [b for b in self.SEQ_BUCKETS if b < max_length] + [max_length]
             
         try:
-            logger.info(f"Loading model {model_name} on {self.device}")
-            self.model = CrossEncoder(model_name, device=self.device)
+            logger.info(f"Loading model {model_name} on {self.device} ({backend} backend)")
+            self.model = self._load_model()
+            if self.quantize:
+                # Dynamic quantization works on FP32 weights, so it replaces the cast
+                self.torch_dtype = torch.float32
+                self.model.model = torch.quantization.quantize_dynamic(
+                    self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                logger.info("Applied INT8 dynamic quantization to Linear layers")
+            elif self.backend == "torch" and self.torch_dtype != torch.float32:
+                self.model.model.to(dtype=self.torch_dtype)
+            if self.compile_model:
+                # CUDA graphs ("reduce-overhead") only pay off on GPU
+                mode = "reduce-overhead" if torch.device(self.device).type == "cuda" else "default"
+                # Inputs are padded to fixed buckets, so shapes are specialized statically
+                self.model.model = torch.compile(
+                    self.model.model, mode=mode, fullgraph=False, dynamic=False
+                )
+                logger.info(f"Compiled model forward with torch.compile (mode={mode})")
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self._init_pinned_buffers()
             logger.info("Model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             raise
 
-    def prepare_pairs(self, query: str, rels: List[str]) -> List[List[str]]:
+    def _resolve_dtype(self, dtype: Optional[str]) -> torch.dtype:
         """
-        Prepare and validate query-relation pairs for scoring.
+        Resolve the inference precision for the torch backend.
+
+        Defaults to BF16 on GPUs that support it (Ampere+), FP16 on other GPUs
+        and FP32 on CPU.
+
+        Args:
+            dtype (Optional[str]): One of 'fp16', 'bf16', 'fp32' or None for auto
+
+        Returns:
+            torch.dtype: The resolved dtype
+        """
+        on_cuda = torch.device(self.device).type == "cuda"
+        if dtype is None:
+            if not on_cuda:
+                return torch.float32
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {tuple(self.DTYPES)}")
+        if dtype == "fp16" and not on_cuda:
+            logger.warning("FP16 inference is not supported on CPU, falling back to FP32")
+            return torch.float32
+        return self.DTYPES[dtype]
+
+    def _can_quantize(self) -> bool:
+        """
+        Check whether INT8 dynamic quantization applies to this configuration.
+
+        Returns:
+            bool: True for the torch backend on CPU
+        """
+        if self.backend != "torch" or torch.device(self.device).type != "cpu":
+            logger.warning("INT8 dynamic quantization is only supported for the torch backend on CPU")
+            return False
+        return True
+
+    def _load_model(self) -> CrossEncoder:
+        """
+        Load the cross-encoder for the configured backend.
+
+        For the ONNX and OpenVINO backends the exported graph is saved to
+        ``export_dir`` on first load, so later loads skip the export step.
+
+        Returns:
+            CrossEncoder: The loaded cross-encoder
+        """
+        if self.backend == "torch":
+            return CrossEncoder(self.model_name, device=self.device)
+
+        model_kwargs = {}
+        if self.backend == "onnx":
+            model_kwargs["provider"] = (
+                "CUDAExecutionProvider" if self.device == "cuda" else "CPUExecutionProvider"
+            )
+
+        exported = self.export_dir is not None and os.path.isdir(self.export_dir)
+        model = CrossEncoder(
+            self.export_dir if exported else self.model_name,
+            device=self.device,
+            backend=self.backend,
+            model_kwargs=model_kwargs
+        )
+        if self.export_dir is not None and not exported:
+            logger.info(f"Saving exported {self.backend} model to {self.export_dir}")
+            model.save_pretrained(self.export_dir)
+        return model
+
+    def prepare_pairs(self, query: str, rels: List[str]) -> List[Tuple[str, str]]:
+        """
+        Prepare query-relation pairs for scoring.
+        
+        Empty relations are skipped and the rest truncated to ``max_chars``.
+        Token length is checked once per batch at scoring time.
         
         Args:
             query (str): The query text
             rels (List[str]): List of relation texts
             
         Returns:
-            List[List[str]]: List of [query, relation] pairs
+            List[Tuple[str, str]]: List of (query, relation) pairs
         """
-        pairs = []
-        for rel in rels:
-            # Skip empty relations
-            if not rel.strip():
-                continue
-                
-            # Truncate relation if needed
-            truncated_rel = rel[:self.max_chars]
-            if len(rel) > self.max_chars:
-                logger.debug(f"Truncated relation from {len(rel)} to {self.max_chars} chars")
+        max_chars = self.max_chars
+        truncated_rels = [rel[:max_chars] for rel in rels if rel and not rel.isspace()]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            truncated = sum(len(rel) > max_chars for rel in rels if rel)
+            if truncated:
+                logger.debug(f"Truncated {truncated} relations to {max_chars} chars")
                 
-            # Create and validate pair
-            pair = [query, truncated_rel]
-            tokens = self.tokenizer.encode(query, truncated_rel, add_special_tokens=True)
-            if len(tokens) > self.max_length:
-                logger.warning(
-                    f"Token length {len(tokens)} exceeds max_length {self.max_length}\n"
-                    f"Query: {query[:50]}...\nRel: {truncated_rel[:50]}..."
-                )
-            
-            pairs.append(pair)
-            
-        return pairs
+        return [(query, rel) for rel in truncated_rels]
 
     def score_batch(self, pairs: List[List[str]]) -> np.ndarray:
         """
@@ -98,25 +250,183 @@ class UMLS_CrossEncoder:
             np.ndarray: Array of scores
         """
         try:
-            # Tokenize
-            encodings = self.tokenizer(
-                pairs,
-                truncation=True,
-                padding=True,
-                max_length=self.max_length,
-                return_tensors="pt"
-            ).to(self.device)
-            
-            # Get scores
-            with torch.no_grad():
-                logits = self.model.model(**encodings).logits
-                scores = logits.cpu().numpy().flatten()
-                
-            return scores
-            
+            return self._score_batch(pairs)
         except Exception as e:
             logger.error(f"Error in batch scoring: {str(e)}")
-            return np.array([0.0] * len(pairs))  # Return zero scores on error
+            return np.zeros(len(pairs), dtype=np.float32)  # Return zero scores on error
+
+    def _score_batch(self, pairs: List[List[str]]) -> np.ndarray:
+        """
+        Score a batch of query-relation pairs, raising on failure.
+        
+        Args:
+            pairs (List[List[str]]): List of [query, relation] pairs
+            
+        Returns:
+            np.ndarray: Array of scores
+        """
+        if self.backend != "torch":
+            # Exported backends run through the Sentence-Transformers session;
+            # keep raw logits so scores match the torch backend
+            return self.model.predict(
+                pairs,
+                batch_size=len(pairs),
+                activation_fn=torch.nn.Identity(),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ).flatten()
+
+        encodings, n_pairs = self._encode(pairs)
+        logits = self._forward(self._to_device(encodings), n_pairs)
+        return logits.cpu().numpy().flatten()
+
+    def _encode(self, pairs: List[Tuple[str, str]]) -> Tuple[dict, int]:
+        """
+        Tokenize a batch of pairs into CPU tensors ready for the forward pass.
+        
+        The tokenizer's own pair encoding (special tokens, token types and
+        longest-first truncation) is used, so the inputs match what the model
+        was trained on for every tokenizer and transformers version.
+        
+        Args:
+            pairs (List[Tuple[str, str]]): List of (query, relation) pairs
+            
+        Returns:
+            Tuple[dict, int]: Input tensors and the number of real (unpadded) rows
+        """
+        encodings = self.tokenizer(
+            [query for query, _ in pairs],
+            [rel for _, rel in pairs],
+            truncation="longest_first",
+            padding=True,
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+        # Pairs that fill max_length were cut by the tokenizer
+        truncated = int((encodings["attention_mask"].sum(-1) >= self.max_length).sum())
+            
+        if truncated:
+            logger.warning(
+                f"{truncated} of {len(pairs)} pairs reached max_length {self.max_length} "
+                f"and may have been truncated"
+            )
+        
+        # Compiled graphs are cached per shape: pad the sequence to a length bucket
+        # and the batch to a power of two (repeating the last row) so varying
+        # inputs reuse a few graphs
+        n_pairs = len(pairs)
+        if self.compile_model:
+            seq_len = encodings["input_ids"].shape[1]
+            bucket = next(b for b in self._buckets if b >= seq_len)
+            if bucket > seq_len:
+                pad_id = self.tokenizer.pad_token_id or 0
+                encodings = {
+                    key: torch.nn.functional.pad(
+                        value, (0, bucket - seq_len), value=pad_id if key == "input_ids" else 0
+                    )
+                    for key, value in encodings.items()
+                }
+            padded = 1 << (n_pairs - 1).bit_length()
+            if padded > n_pairs:
+                encodings = {
+                    key: torch.cat([value, value[-1:].expand(padded - n_pairs, -1)])
+                    for key, value in encodings.items()
+                }
+        return encodings, n_pairs
+
+    def _forward(self, inputs: dict, n_pairs: int) -> torch.Tensor:
+        """
+        Run the model on device inputs without waiting for the result.
+        
+        Args:
+            inputs (dict): Input tensors on ``self.device``
+            n_pairs (int): Number of real rows to keep
+            
+        Returns:
+            torch.Tensor: FP32 logits on ``self.device``
+        """
+        with torch.inference_mode(), torch.autocast(
+            device_type=torch.device(self.device).type,
+            dtype=self.torch_dtype,
+            enabled=self.torch_dtype != torch.float32
+        ):
+            # Clone so CUDA-graph replays of the next batch cannot overwrite it
+            return self.model.model(**inputs).logits[:n_pairs].float().clone()
+
+    def _init_pinned_buffers(self) -> None:
+        """
+        Preallocate page-locked staging buffers for host-to-GPU input copies.
+        
+        Two buffer sets are used alternately, so one batch can be staged while the
+        previous batch's copy is still in flight.
+        """
+        self._pinned = None
+        self._pinned_slot = 0
+        self._copy_stream = None
+        if self.backend != "torch" or torch.device(self.device).type != "cuda":
+            return
+            
+        self._copy_stream = torch.cuda.Stream(device=self.device)            
+        numel = self.batch_size * self.MAX_BATCH_SCALE * self.max_length
+        self._pinned = [
+            {
+                key: torch.empty(numel, dtype=torch.long, pin_memory=True)
+                for key in ("input_ids", "attention_mask", "token_type_ids")
+            }
+            for _ in range(2)
+        ]
+
+    def _to_device(self, encodings) -> dict:
+        """
+        Move tokenized inputs to the model device.
+        
+        On GPU the tensors are staged through the pinned buffers and copied with
+        ``non_blocking=True``; elsewhere they are moved as is.
+        
+        Args:
+            encodings: Mapping of input names to CPU tensors
+            
+        Returns:
+            dict: Mapping of input names to tensors on ``self.device``
+        """
+        if self._pinned is None:
+            return {key: value.to(self.device) for key, value in encodings.items()}
+            
+        buffers = self._pinned[self._pinned_slot]
+        self._pinned_slot ^= 1
+        
+        inputs = {}
+        for key, value in encodings.items():
+            flat = buffers.get(key)
+            if flat is None or flat.numel() < value.numel() or flat.dtype != value.dtype:
+                flat = torch.empty(value.numel(), dtype=value.dtype, pin_memory=True)
+                buffers[key] = flat
+            staged = flat[:value.numel()].view(value.shape)
+            staged.copy_(value)
+            inputs[key] = staged.to(self.device, non_blocking=True)
+        return inputs
+
+    def _to_device_async(self, encodings) -> dict:
+        """
+        Copy inputs to the GPU on the side stream so the copy overlaps compute.
+        
+        The compute stream is made to wait for the copy, so kernels launched
+        afterwards see complete inputs.
+        
+        Args:
+            encodings: Mapping of input names to CPU tensors
+            
+        Returns:
+            dict: Mapping of input names to tensors on ``self.device``
+        """
+        with torch.cuda.stream(self._copy_stream):
+            inputs = self._to_device(encodings)
+        compute = torch.cuda.current_stream()
+        compute.wait_stream(self._copy_stream)
+        for value in inputs.values():
+            # Memory allocated on the copy stream is now used by the compute stream
+            value.record_stream(compute)
+        return inputs
 
     def score(self, query: str, rels: List[str], show_progress: bool = False) -> np.ndarray:
         """
@@ -133,36 +443,271 @@ class UMLS_CrossEncoder:
         # Input validation
         if not rels:
             logger.warning("Empty relations list provided")
-            return np.array([])
+            return np.empty(0, dtype=np.float32)
             
         if not query.strip():
             logger.warning("Empty query provided")
-            return np.array([0.0] * len(rels))
+            return np.zeros(len(rels), dtype=np.float32)
         
         try:
             # Prepare pairs
             pairs = self.prepare_pairs(query, rels)
             if not pairs:
-                return np.array([])
-                
-            # Score in batches
-            scores = []
-            batches = range(0, len(pairs), self.batch_size)
-            
-            # Add progress bar if requested
-            if show_progress:
-                batches = tqdm(batches, desc="Scoring pairs")
+                return np.empty(0, dtype=np.float32)
                 
-            for i in batches:
-                batch_pairs = pairs[i:i + self.batch_size]
-                batch_scores = self.score_batch(batch_pairs)
-                scores.extend(batch_scores)
+            # Resolve cached scores, run the model only on misses
+            keys = [self._cache_key(query, rel) for _, rel in pairs]
+            scores = np.empty(len(pairs), dtype=np.float32)
+            misses = []
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    misses.append(i)
+                else:
+                    scores[i] = cached
+                    
+            if misses:
+                miss_scores = self._score_pairs([pairs[i] for i in misses], show_progress)
+                scores[misses] = miss_scores
+                for i, value in zip(misses, miss_scores):
+                    # Failed batches come back as NaN and are not cached
+                    if np.isfinite(value):
+                        self._cache.set(keys[i], float(value))
             
-            return np.array(scores)
+            return np.nan_to_num(scores, nan=0.0)
             
+        except BatchScoringError:
+            # Every batch failed: a systematic error, not something to hide as zero scores
+            raise
         except Exception as e:
             logger.error(f"Error in scoring: {str(e)}")
-            return np.array([0.0] * len(rels))
+            return np.zeros(len(rels), dtype=np.float32)
+
+    def _score_pairs(self, pairs: List[List[str]], show_progress: bool = False) -> np.ndarray:
+        """
+        Score pairs in length-bucketed batches, writing back in input order.
+        
+        Args:
+            pairs (List[List[str]]): List of [query, relation] pairs
+            show_progress (bool): Whether to show a progress bar
+            
+        Returns:
+            np.ndarray: Array of scores, NaN for pairs whose batch failed
+            
+        Raises:
+            BatchScoringError: If every batch failed
+        """
+        if self._use_instances(len(pairs)):
+            return self._score_multi_instance(pairs)
+            
+        # The query is encoded into every row, so it counts toward the token budget
+        lengths = np.fromiter((len(query) + len(rel) for query, rel in pairs), dtype=np.int64, count=len(pairs))
+        batches = self._length_batches(lengths)
+        scores = np.empty(len(pairs), dtype=np.float32)
+        
+        # Add progress bar if requested
+        if show_progress:
+            batches = tqdm(batches, desc="Scoring pairs")
+            
+        if self._copy_stream is not None and len(batches) > 1:
+            self._score_pipelined(pairs, batches, scores)
+        else:
+            for indices in batches:
+                batch_pairs = [pairs[i] for i in indices]
+                try:
+                    scores[indices] = self._score_batch(batch_pairs)
+                except Exception as e:
+                    logger.error(f"Error in batch scoring: {str(e)}")
+                    scores[indices] = np.nan
+                    
+        if np.isnan(scores).all():
+            raise BatchScoringError(f"All {len(batches)} scoring batches failed, see the errors above")
+        return scores
+
+    def _score_pipelined(
+        self,
+        pairs: List[Tuple[str, str]],
+        batches: List[np.ndarray],
+        scores: np.ndarray
+    ) -> None:
+        """
+        Score batches on GPU with tokenization running ahead in a producer thread.
+        
+        The producer tokenizes batches into a bounded queue while the main thread
+        copies each batch on the side stream and launches its forward before
+        collecting the previous batch's logits, so tokenization, host-to-device
+        copies and compute overlap.
+        
+        Args:
+            pairs (List[Tuple[str, str]]): List of (query, relation) pairs
+            batches (List[np.ndarray]): Index arrays into ``pairs``
+            scores (np.ndarray): Output array, filled in place (NaN for failed batches)
+        """
+        encoded = queue.Queue(maxsize=self.PIPELINE_DEPTH)
+        stop = threading.Event()
+        
+        def produce():
+            for indices in batches:
+                try:
+                    item = (indices, self._encode([pairs[i] for i in indices]), None)
+                except Exception as e:
+                    item = (indices, None, e)
+                while not stop.is_set():
+                    try:
+                        encoded.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+                    
+        def collect(pending):
+            indices, logits = pending
+            try:
+                scores[indices] = logits.cpu().numpy().flatten()
+            except Exception as e:
+                logger.error(f"Error in batch scoring: {str(e)}")
+                scores[indices] = np.nan
+                
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            producer = executor.submit(produce)
+            try:
+                for _ in range(len(batches)):
+                    indices, batch, error = encoded.get()
+                    launched = None
+                    if error is None:
+                        try:
+                            inputs = self._to_device_async(batch[0])
+                            launched = (indices, self._forward(inputs, batch[1]))
+                        except Exception as e:
+                            error = e
+                    if error is not None:
+                        logger.error(f"Error in batch scoring: {str(error)}")
+                        scores[indices] = np.nan
+                    if pending is not None:
+                        collect(pending)
+                    pending = launched
+                if pending is not None:
+                    collect(pending)
+            finally:
+                stop.set()
+            producer.result()
+
+    def _use_instances(self, n_pairs: int) -> bool:
+        """Whether a workload is large enough to split across CPU worker processes."""
+        return (
+            self.num_instances > 1
+            and torch.device(self.device).type == "cpu"
+            and n_pairs >= self.num_instances * self.batch_size
+        )
+
+    def _get_pool(self):
+        """
+        Start the CPU worker pool on first use.
+        
+        Each worker is pinned to its own contiguous core subset and limited to
+        ``threads_per_instance`` intra-op threads, which keeps its working set
+        in local caches instead of spreading one forward over every core.
+        
+        Returns:
+            multiprocessing.pool.Pool: The worker pool
+        """
+        if self._pool is not None:
+            return self._pool
+            
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        threads = self.threads_per_instance or max(1, len(cores) // self.num_instances)
+        
+        ctx = multiprocessing.get_context("spawn")
+        core_queue = ctx.Queue()
+        for rank in range(self.num_instances):
+            core_queue.put(cores[rank * threads:(rank + 1) * threads])
+            
+        logger.info(f"Starting {self.num_instances} CPU instances with {threads} threads each")
+        self._pool = ctx.Pool(
+            self.num_instances,
+            initializer=_init_worker,
+            initargs=(self._worker_kwargs, threads, core_queue)
+        )
+        return self._pool
+
+    def _score_multi_instance(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """
+        Split pairs into one chunk per worker process and score them in parallel.
+        
+        Args:
+            pairs (List[Tuple[str, str]]): List of (query, relation) pairs
+            
+        Returns:
+            np.ndarray: Array of scores in input order
+        """
+        chunk_size = -(-len(pairs) // self.num_instances)
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        return np.concatenate(self._get_pool().map(_score_chunk, chunks))
+
+    def close(self) -> None:
+        """Shut down the CPU worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _cache_key(self, query: str, rel: str) -> bytes:
+        """
+        Build the score-cache key for a query-relation pair.
+        
+        The key covers everything that changes the score besides the texts (model,
+        backend, dtype, quantization and max_length), so a persistent cache never
+        returns scores computed under a different configuration.
+        
+        Args:
+            query (str): The query text
+            rel (str): The (already truncated) relation text
+            
+        Returns:
+            bytes: 16-byte BLAKE2b digest
+        """
+        return hashlib.blake2b(
+            f"{self.model_name}|{self.backend}|{self.torch_dtype}|{int(self.quantize)}|"
+            f"{self.max_length}|{query}|{rel}".encode("utf-8"), digest_size=16
+        ).digest()
+
+    def clear_cache(self) -> None:
+        """Drop all cached scores."""
+        self._cache.clear()
+
+    def _length_batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """
+        Group pair indices into batches of similar length.
+        
+        Pairs are ordered longest-first so every batch pads only to its own
+        longest member. Batches of short pairs hold more items (up to
+        ``MAX_BATCH_SCALE * batch_size``) so each batch carries roughly the
+        same number of tokens as ``batch_size`` of the longest pairs.
+        
+        Args:
+            lengths (np.ndarray): Approximate length of each pair, query and
+                relation combined
+            
+        Returns:
+            List[np.ndarray]: Index arrays into the original pair list
+        """
+        order = np.argsort(-lengths, kind="stable")
+        budget = self.batch_size * max(int(lengths[order[0]]), 1)
+        max_batch = self.batch_size * self.MAX_BATCH_SCALE
+        
+        batches = []
+        start = 0
+        while start < len(order):
+            longest = max(int(lengths[order[start]]), 1)
+            size = min(max(budget // longest, self.batch_size), max_batch)
+            batches.append(order[start:start + size])
+            start += size
+        return batches
 
     def truncate_rels(self, rels: List[str]) -> List[str]:
         """
@@ -1,6 +1,16 @@
 from typing import List, Dict, Any
 import logging
-from collections import defaultdict
+import re
+import sys
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -72,6 +82,138 @@ LOGIC_GROUPS = {
     ]
 }
 
+# Fields that identify a triplet dict
+TRIPLET_KEYS = ("relatedFromIdName", "additionalRelationLabel", "relatedIdName")
+
+# Compact internal triplet: head entity, relation label, tail entity
+Triplet = namedtuple("Triplet", ["frm", "label", "to"])
+
+# Freeze the groups so membership checks are O(1) hash lookups
+LOGIC_GROUPS = {group: frozenset(labels) for group, labels in LOGIC_GROUPS.items()}
+
+# Groups of every known label (a few labels belong to more than one group)
+LABEL_TO_GROUPS = {
+    label: frozenset(group for group, labels in LOGIC_GROUPS.items() if label in labels)
+    for labels in LOGIC_GROUPS.values()
+    for label in labels
+}
+
+# KGs at least this large run the rule join in the compiled kernel (when numba is available)
+NUMBA_MIN_TRIPLETS = 10000
+
+# Group bits of the compiled kernel's per-triplet mask
+_HIERARCHY, _TREATMENT, _CAUSATION, _INTERACTION, _DIAGNOSIS = 1, 2, 4, 8, 16
+_GROUP_BITS = {
+    "Hierarchy": _HIERARCHY, "Treatment": _TREATMENT,
+    "Causation": _CAUSATION, "Interaction": _INTERACTION
+}
+
+# Rule codes emitted by the kernel: (bucket, relation), in bucket order
+_RULES = (
+    ("co_occurs", "affects"), ("prevents", "prevents"), ("treats", "treats"),
+    ("diagnoses", "diagnoses"), ("conjunction", "co-occurs_with")
+)
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _fol_pass(frm, to, mask, starts, members, codes, srcs, dsts, write):
+        """
+        Run every rule over integer-encoded triplets, mirroring ``_apply_rules``.
+        
+        Candidates are emitted in the same order as the pure-Python pass. With
+        ``write`` False they are only counted, so the caller can size the output.
+        """
+        count = 0
+        for i in range(frm.shape[0]):
+            head, tail, m = frm[i], to[i], mask[i]
+            
+            if m & _INTERACTION:
+                for k in range(starts[tail], starts[tail + 1]):
+                    j = members[k]
+                    if mask[j] & _CAUSATION and head != to[j]:
+                        if write:
+                            codes[count], srcs[count], dsts[count] = 0, head, to[j]
+                        count += 1
+                for k in range(starts[head], starts[head + 1]):
+                    j = members[k]
+                    if mask[j] & _CAUSATION and tail != to[j]:
+                        if write:
+                            codes[count], srcs[count], dsts[count] = 4, tail, to[j]
+                        count += 1
+                        
+            if m & _TREATMENT:
+                for k in range(starts[tail], starts[tail + 1]):
+                    j = members[k]
+                    if mask[j] & _CAUSATION and head != to[j]:
+                        if write:
+                            codes[count], srcs[count], dsts[count] = 1, head, to[j]
+                        count += 1
+                for k in range(starts[tail], starts[tail + 1]):
+                    j = members[k]
+                    if mask[j] & _HIERARCHY and head != to[j]:
+                        if write:
+                            codes[count], srcs[count], dsts[count] = 2, head, to[j]
+                        count += 1
+                        
+            if m & _DIAGNOSIS:
+                for k in range(starts[head], starts[head + 1]):
+                    j = members[k]
+                    if mask[j] & _INTERACTION and to[j] != head:
+                        if write:
+                            codes[count], srcs[count], dsts[count] = 3, to[j], tail
+                        count += 1
+        return count
+
+    @numba.njit(cache=True)
+    def _fol_kernel(frm, to, mask, n_ids):
+        """
+        Join integer-encoded triplets on head entity and emit rule candidates.
+        
+        Triplets are bucketed by head with a stable counting sort (CSR layout),
+        so each head's triplets keep input order like the Python index.
+        
+        Returns:
+            Tuple of (rule code, source id, target id) arrays, possibly with duplicates
+        """
+        n = frm.shape[0]
+        starts = np.zeros(n_ids + 1, dtype=np.int64)
+        for i in range(n):
+            starts[frm[i] + 1] += 1
+        for k in range(n_ids):
+            starts[k + 1] += starts[k]
+        fill = starts[:-1].copy()
+        members = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            members[fill[frm[i]]] = i
+            fill[frm[i]] += 1
+            
+        empty = np.empty(0, dtype=np.int32)
+        total = _fol_pass(frm, to, mask, starts, members, empty.astype(np.int8), empty, empty, False)
+        codes = np.empty(total, dtype=np.int8)
+        srcs = np.empty(total, dtype=np.int32)
+        dsts = np.empty(total, dtype=np.int32)
+        _fol_pass(frm, to, mask, starts, members, codes, srcs, dsts, True)
+        return codes, srcs, dsts
+else:
+    _fol_kernel = None
+
+# Namespace prefixes such as "snomed:", "http://.../" or "...#"
+_LABEL_PREFIX = re.compile(r"^.*[:/#]")
+
+@lru_cache(maxsize=4096)
+def _normalize_label(label: Any) -> Any:
+    """
+    Map a relation label variant to its canonical ``LOGIC_GROUPS`` form.
+    
+    Strips namespace prefixes, lowercases and joins words with underscores, so
+    "snomed:treats", "Treats" and "may be treated by" all resolve. Results are
+    memoized since a KG uses only a few hundred distinct labels.
+    """
+    if not isinstance(label, str):
+        return label
+    label = _LABEL_PREFIX.sub("", label.strip()).lower().replace(" ", "_")
+    return sys.intern(label)
+
 class FOLReasoner:
     """
     First Order Logic (FOL) Reasoner for medical knowledge graphs.
@@ -82,8 +224,22 @@ class FOLReasoner:
     
     def __init__(self):
         """Initialize the FOL Reasoner."""
-        self.diagnosis_relations = ["diagnoses", "diagnosed_by"]
+        self.diagnosis_relations = frozenset(["diagnoses", "diagnosed_by"])
         
+    @staticmethod
+    def _key(item: Any) -> Any:
+        """
+        Build a hashable dedup key for a triplet.
+        
+        Dicts are keyed on the fixed ``TRIPLET_KEYS`` schema (no per-item sort),
+        lists are converted to tuples and other items are used as is.
+        """
+        if isinstance(item, dict):
+            return tuple(item.get(key) for key in TRIPLET_KEYS)
+        if isinstance(item, list):
+            return tuple(item)
+        return item
+
     @staticmethod
     def remove_duplicate(kg_triples: List[Any]) -> List[Any]:
         """
@@ -95,25 +251,55 @@ class FOLReasoner:
         Returns:
             List[Any]: Deduplicated list of triplets
         """
+        key = FOLReasoner._key
         seen = set()
         result = []
         for item in kg_triples:
-            if isinstance(item, dict):
-                # For dictionaries, create a tuple of sorted items
-                item_tuple = tuple(sorted(item.items()))
-            elif isinstance(item, list):
-                # For lists, convert to tuple
-                item_tuple = tuple(item)
-            else:
-                # For other types, use as is
-                item_tuple = item
-                
-            if item_tuple not in seen:
-                seen.add(item_tuple)
+            item_key = key(item)
+            if item_key not in seen:
+                seen.add(item_key)
                 result.append(item)
         
         return result
 
+    @staticmethod
+    def _to_triplets(kg_triplets: List[Dict[str, str]]) -> List[Triplet]:
+        """
+        Convert triplet dicts to deduplicated ``Triplet`` tuples, keeping input order.
+        
+        Labels are stored in canonical form (see ``_normalize_label``) and interned,
+        since the same few hundred labels repeat across the KG.
+        
+        Args:
+            kg_triplets (List[Dict[str, str]]): List of knowledge graph triplets
+            
+        Returns:
+            List[Triplet]: Unique triplets
+        """
+        triplets = {}
+        for t in kg_triplets:
+            label = _normalize_label(t.get("additionalRelationLabel"))
+            triplets.setdefault(Triplet(t.get("relatedFromIdName"), label, t.get("relatedIdName")))
+        return list(triplets)
+
+    @staticmethod
+    def _build_index(triplets: List[Triplet]) -> Dict[str, Dict[str, List[Triplet]]]:
+        """
+        Index triplets by logic group and head entity.
+        
+        Args:
+            triplets (List[Triplet]): List of knowledge graph triplets
+            
+        Returns:
+            Dict[str, Dict[str, List[Triplet]]]: For every logic group, the
+            triplets of that group keyed by head entity (in input order)
+        """
+        index = {group: defaultdict(list) for group in LOGIC_GROUPS}
+        for triplet in triplets:
+            for group in LABEL_TO_GROUPS.get(triplet.label, ()):
+                index[group][triplet.frm].append(triplet)
+        return index
+
     def apply_rules_to_kg(self, kg_triplets):
         """
         Apply logical rules to knowledge graph triplets to infer new relationships.
@@ -125,104 +311,150 @@ class FOLReasoner:
             List[List[str]]: List of inferred relationship triplets
         """
         try:
-            # Remove duplicates from input
-            kg_triplets = self.remove_duplicate(kg_triplets)
-            
-            # Initialize containers for different types of inferred relations
-            inferred_relations = defaultdict(list)
+            # Convert to deduplicated tuples once
+            triplets = self._to_triplets(kg_triplets)
             
-            # Apply each rule
-            self._apply_co_occurrence_rule(kg_triplets, inferred_relations)
-            self._apply_prevention_rule(kg_triplets, inferred_relations)
-            self._apply_treatment_rule(kg_triplets, inferred_relations)
-            self._apply_diagnosis_rule(kg_triplets, inferred_relations)
-            self._apply_conjunction_rule(kg_triplets, inferred_relations)
+            if _fol_kernel is not None and len(triplets) >= NUMBA_MIN_TRIPLETS:
+                inferred_relations = self._apply_rules_compiled(triplets)
+            else:
+                # Join candidates are looked up by head entity instead of rescanning the KG
+                index = self._build_index(triplets)
+                
+                # Apply all rules in a single pass; duplicates are dropped as they are emitted
+                inferred_relations = self._apply_rules(triplets, index)
             
-            # Combine and deduplicate all inferred relations
+            # Combine the per-rule relations in rule order
             result = []
             for relation_type in inferred_relations.values():
-                result.extend(self.remove_duplicate(relation_type))
+                result.extend(relation_type)
                 
-            return self.remove_duplicate(result)
+            return result
             
         except Exception as e:
             logger.error("Error applying FOL rules: %s", str(e))
             return []
 
-    def _apply_co_occurrence_rule(self, kg_triplets, 
-                                inferred_relations):
-        """Apply the rule of co-occurrence."""
-        for triplet in kg_triplets:
-            if triplet.get("additionalRelationLabel") in LOGIC_GROUPS['Interaction']:
-                for other_triplet in kg_triplets:
-                    if (other_triplet.get("relatedFromIdName") == triplet.get("relatedIdName") and 
-                        other_triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Causation"]):
-                        if triplet.get("relatedFromIdName") != other_triplet.get("relatedIdName"):
-                            inferred_relations['co_occurs'].append([
-                                triplet.get("relatedFromIdName"),
-                                "affects",
-                                other_triplet.get("relatedIdName")
-                            ])
-
-    def _apply_prevention_rule(self, kg_triplets, 
-                             inferred_relations):
-        """Apply the rule of prevention and causation."""
-        for triplet in kg_triplets:
-            if triplet.get("additionalRelationLabel") in LOGIC_GROUPS['Treatment']:
-                for other_triplet in kg_triplets:
-                    if (other_triplet.get("relatedFromIdName") == triplet.get("relatedIdName") and 
-                        other_triplet.get("additionalRelationLabel") in LOGIC_GROUPS['Causation']):
-                        if triplet.get("relatedFromIdName") != other_triplet.get("relatedIdName"):
-                            inferred_relations['prevents'].append([
-                                triplet.get("relatedFromIdName"),
-                                "prevents",
-                                other_triplet.get("relatedIdName")
-                            ])
-
-    def _apply_treatment_rule(self, kg_triplets, 
-                            inferred_relations):
-        """Apply the rule of treatment and classification."""
-        for triplet in kg_triplets:
-            if triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Treatment"]:
-                for other_triplet in kg_triplets:
-                    if (other_triplet.get("relatedFromIdName") == triplet.get("relatedIdName") and 
-                        other_triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Hierarchy"]):
-                        if triplet.get("relatedFromIdName") != other_triplet.get("relatedIdName"):
-                            inferred_relations['treats'].append([
-                                triplet.get("relatedFromIdName"),
-                                "treats",
-                                other_triplet.get("relatedIdName")
-                            ])
-
-    def _apply_diagnosis_rule(self, kg_triplets, 
-                            inferred_relations):
-        """Apply the rule of diagnosis and interaction."""
-        for triplet in kg_triplets:
-            if triplet.get("additionalRelationLabel") in self.diagnosis_relations:
-                for other_triplet in kg_triplets:
-                    if (other_triplet.get("relatedFromIdName") == triplet.get("relatedFromIdName") and 
-                        other_triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Interaction"]):
-                        if other_triplet.get("relatedIdName") != triplet.get("relatedFromIdName"):
-                            inferred_relations['diagnoses'].append([
-                                other_triplet.get("relatedIdName"),
-                                "diagnoses",
-                                triplet.get("relatedIdName")
-                            ])
-
-    def _apply_conjunction_rule(self, kg_triplets, 
-                              inferred_relations):
-        """Apply the rule of conjunction."""
-        for triplet in kg_triplets:
-            if triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Interaction"]:
-                for other_triplet in kg_triplets:
-                    if (other_triplet.get("relatedFromIdName") == triplet.get("relatedFromIdName") and 
-                        other_triplet.get("additionalRelationLabel") in LOGIC_GROUPS["Causation"]):
-                        if triplet.get("relatedIdName") != other_triplet.get("relatedIdName"):
-                            inferred_relations['conjunction'].append([
-                                triplet.get("relatedIdName"),
-                                "co-occurs_with",
-                                other_triplet.get("relatedIdName")
-                            ])
+    def _encode_triplets(self, triplets: List[Triplet]):
+        """
+        Encode triplets as integer arrays for the compiled kernel.
+        
+        Entity names are interned to int32 ids and labels mapped to an int8
+        bitmask of their logic groups (plus a diagnosis bit).
+        
+        Args:
+            triplets (List[Triplet]): Deduplicated knowledge graph triplets
+            
+        Returns:
+            Tuple[List[Any], np.ndarray, np.ndarray, np.ndarray]: Entity names by id,
+            head ids, tail ids and group masks
+        """
+        ids = {}
+        label_masks = {}
+        n = len(triplets)
+        frm = np.empty(n, dtype=np.int32)
+        to = np.empty(n, dtype=np.int32)
+        mask = np.empty(n, dtype=np.int8)
+        for i, (head, label, tail) in enumerate(triplets):
+            frm[i] = ids.setdefault(head, len(ids))
+            to[i] = ids.setdefault(tail, len(ids))
+            m = label_masks.get(label)
+            if m is None:
+                m = sum(_GROUP_BITS.get(group, 0) for group in LABEL_TO_GROUPS.get(label, ()))
+                if label in self.diagnosis_relations:
+                    m |= _DIAGNOSIS
+                label_masks[label] = m
+            mask[i] = m
+        return list(ids), frm, to, mask
+
+    def _apply_rules_compiled(self, triplets: List[Triplet]) -> Dict[str, List[List[str]]]:
+        """
+        Compiled equivalent of ``_apply_rules`` for large KGs.
+        
+        The kernel emits candidates in the pure-Python order; duplicates are
+        dropped here by keeping the first occurrence of each triplet.
+        
+        Args:
+            triplets (List[Triplet]): Deduplicated knowledge graph triplets
+            
+        Returns:
+            Dict[str, List[List[str]]]: Unique inferred triplets per rule, in rule order
+        """
+        names, frm, to, mask = self._encode_triplets(triplets)
+        codes, srcs, dsts = _fol_kernel(frm, to, mask, len(names))
+        
+        n_ids = np.int64(len(names))
+        keys = (codes.astype(np.int64) * n_ids + srcs) * n_ids + dsts
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        
+        inferred_relations = {bucket: [] for bucket, _ in _RULES}
+        for code, src, dst in zip(codes[first].tolist(), srcs[first].tolist(), dsts[first].tolist()):
+            bucket, relation = _RULES[code]
+            inferred_relations[bucket].append([names[src], relation, names[dst]])
+        return inferred_relations
+
+    def _apply_rules(self, triplets, index):
+        """
+        Apply every rule in one pass over the triplets.
+        
+        Rules (head/tail are relatedFromIdName/relatedIdName):
+            co-occurrence: Interaction(a, b) & Causation(b, c) -> a affects c
+            conjunction:   Interaction(a, b) & Causation(a, c) -> b co-occurs_with c
+            prevention:    Treatment(a, b) & Causation(b, c)   -> a prevents c
+            treatment:     Treatment(a, b) & Hierarchy(b, c)   -> a treats c
+            diagnosis:     diagnoses(a, b) & Interaction(a, c) -> c diagnoses b
+        
+        Args:
+            triplets (List[Triplet]): Deduplicated knowledge graph triplets
+            index (Dict[str, Dict[str, List[Triplet]]]): Output of ``_build_index``
+            
+        Returns:
+            Dict[str, List[List[str]]]: Unique inferred triplets per rule, in rule order
+        """
+        inferred_relations = {
+            "co_occurs": [], "prevents": [], "treats": [], "diagnoses": [], "conjunction": []
+        }
+        co_occurs = inferred_relations["co_occurs"]
+        prevents = inferred_relations["prevents"]
+        treats = inferred_relations["treats"]
+        diagnoses = inferred_relations["diagnoses"]
+        conjunction = inferred_relations["conjunction"]
+        causation = index["Causation"]
+        hierarchy = index["Hierarchy"]
+        interaction = index["Interaction"]
+        seen = set()
+        
+        def emit(bucket, head, relation, tail):
+            key = (head, relation, tail)
+            if key not in seen:
+                seen.add(key)
+                bucket.append([head, relation, tail])
+        
+        for head, label, tail in triplets:
+            groups = LABEL_TO_GROUPS.get(label, ())
+            
+            if "Interaction" in groups:
+                for other in causation.get(tail, ()):
+                    if head != other.to:
+                        emit(co_occurs, head, "affects", other.to)
+                for other in causation.get(head, ()):
+                    if tail != other.to:
+                        emit(conjunction, tail, "co-occurs_with", other.to)
+                        
+            if "Treatment" in groups:
+                for other in causation.get(tail, ()):
+                    if head != other.to:
+                        emit(prevents, head, "prevents", other.to)
+                for other in hierarchy.get(tail, ()):
+                    if head != other.to:
+                        emit(treats, head, "treats", other.to)
+                        
+            if label in self.diagnosis_relations:
+                for other in interaction.get(head, ()):
+                    if other.to != head:
+                        emit(diagnoses, other.to, "diagnoses", tail)
+                        
+        return inferred_relations
 
 # Example usage:
 # reasoner = FOLReasoner()
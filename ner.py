@@ -1,223 +1,108 @@
 import json
 from transformers import AutoTokenizer, AutoModelForTokenClassification
 from transformers import pipeline
+from transformers.modeling_outputs import TokenClassifierOutput
 import torch
 import re
-from fuzzywuzzy import process
+from rapidfuzz import fuzz, process, utils
 from typing import List, Dict, Union
 import os
+import inspect
+import multiprocessing
+from contextlib import contextmanager
+from functools import lru_cache
+from cache import LRUCache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # Load medical terms from JSON file
-MEDICAL_TERMS = {
-  # Drugs (generic and brand)
-  "amoxicillin": ("C0002637", "Amoxicillin", "A broad-spectrum penicillin antibiotic used to treat various infections."),
-  "ceftaroline": ("C0564627", "Ceftaroline", "A cephalosporin antibiotic effective against MRSA, used for skin and respiratory infections:contentReference[oaicite:8]{index=8}."),
-  "doxycycline": ("C0004057", "Doxycycline", "A tetracycline antibiotic used for infections including acne, malaria prevention, and Lyme disease."),
-  "vancomycin": ("C0040506", "Vancomycin", "A glycopeptide antibiotic used to treat serious gram-positive infections."),
-  "azithromycin": ("C0003535", "Azithromycin", "A macrolide antibiotic used for respiratory, skin, and sexually transmitted infections."),
-  "levofloxacin": ("C0149689", "Levofloxacin", "A fluoroquinolone antibiotic for various bacterial infections."),
-  "fidaxomicin": ("C2821202", "Fidaxomicin", "A macrolide antibiotic primarily used to treat Clostridioides difficile colitis."),
-  "dalbavancin": ("C2820913", "Dalbavancin", "A long-acting lipoglycopeptide antibiotic for acute bacterial skin infections."),
-  "oritavancin": ("C2821380", "Oritavancin", "A lipoglycopeptide antibiotic used to treat Gram-positive skin infections."),
-  "delafloxacin": ("C1284983", "Delafloxacin", "A fluoroquinolone antibiotic for acute bacterial skin and lung infections."),
-  "tigecycline": ("C1308565", "Tigecycline", "A glycylcycline antibiotic effective against multi-drug-resistant organisms."),
-  "ceftolozane": ("C0790322", "Ceftolozane", "A cephalosporin antibiotic often combined with tazobactam for resistant infections."),
-  "ceftolozane/tazobactam": ("C1533118", "Ceftolozane-Tazobactam", "A combination antibiotic for complicated intra-abdominal and urinary tract infections."),
-  
-  # Antivirals and antimalarials
-  "remdesivir": ("C1474153", "Remdesivir", "An antiviral drug approved for COVID-19, targeting viral RNA polymerase."),
-  "molnupiravir": ("C3263273", "Molnupiravir", "An oral antiviral for COVID-19 that introduces copying errors during viral replication."),
-  "nirmatrelvir": ("C3545470", "Nirmatrelvir", "A SARS-CoV-2 protease inhibitor used in combination therapy for COVID-19 (Paxlovid)."),
-  "baloxavir": ("C4062026", "Baloxavir", "An antiviral approved for influenza, targeting the viral cap-dependent endonuclease."),
-  "ivermectin": ("C0021485", "Ivermectin", "An antiparasitic medication used for onchocerciasis and strongyloidiasis."),
-  "artesunate": ("C3462231", "Artesunate", "An artemisinin derivative used to treat severe malaria."),
-  "tafenoquine": ("C3271764", "Tafenoquine", "An antimalarial drug used for relapse prevention in vivax malaria."),
-  
-  # Cancer therapies
-  "ibritumomab tiuxetan": ("C0279390", "Ibritumomab Tiuxetan", "A radioimmunotherapy targeting CD20 on B-cells (Zevalin) for certain lymphomas."),
-  "nivolumab": ("C1851170", "Nivolumab", "A PD-1 immune checkpoint inhibitor antibody used to treat various advanced cancers:contentReference[oaicite:9]{index=9}."),
-  "pembrolizumab": ("C1855280", "Pembrolizumab", "A PD-1 immune checkpoint inhibitor antibody used for melanoma, lung cancer, and others."),
-  "atezolizumab": ("C1622437", "Atezolizumab", "A PD-L1 immune checkpoint inhibitor antibody used for urothelial and lung cancers."),
-  "durvalumab": ("C1604100", "Durvalumab", "A PD-L1 immune checkpoint inhibitor antibody used for bladder and lung cancers."),
-  "avelumab": ("C1622366", "Avelumab", "A PD-L1 immune checkpoint inhibitor antibody used for Merkel cell carcinoma and others."),
-  "ipilimumab": ("C1620927", "Ipilimumab", "A CTLA-4 immune checkpoint inhibitor antibody used for melanoma and renal carcinoma."),
-  "ibrutinib": ("C1574738", "Ibrutinib", "A Bruton's tyrosine kinase inhibitor used in chronic lymphocytic leukemia and lymphoma."),
-  "acalabrutinib": ("C1575185", "Acalabrutinib", "A second-generation BTK inhibitor for CLL and mantle cell lymphoma."),
-  "lenalidomide": ("C1547141", "Lenalidomide", "An immunomodulatory drug used in multiple myeloma and myelodysplastic syndromes."),
-  "pomalidomide": ("C1566210", "Pomalidomide", "An immunomodulatory drug for relapsed or refractory multiple myeloma."),
-  "carfilzomib": ("C1543420", "Carfilzomib", "A proteasome inhibitor used in relapsed multiple myeloma."),
-  "bortezomib": ("C0013448", "Bortezomib", "A proteasome inhibitor used in multiple myeloma and mantle cell lymphoma."),
-  "blinatumomab": ("C1567949", "Blinatumomab", "A bispecific T-cell engager (CD19) used for acute lymphoblastic leukemia."),
-  "tisagenlecleucel": ("C1706443", "Tisagenlecleucel", "A CD19-directed CAR T-cell therapy for refractory leukemia/lymphoma."),
-  "axicabtagene ciloleucel": ("C1706475", "Axicabtagene Ciloleucel", "A CAR T-cell therapy for large B-cell lymphoma."),
-  "palbociclib": ("C1567321", "Palbociclib", "A CDK4/6 inhibitor used in ER-positive, HER2-negative breast cancer."),
-  "ribociclib": ("C1579765", "Ribociclib", "A CDK4/6 inhibitor for hormone receptor-positive breast cancer."),
-  "abemaciclib": ("C1556827", "Abemaciclib", "A CDK4/6 inhibitor used in metastatic breast cancer."),
-  "olaparib": ("C1566249", "Olaparib", "A PARP inhibitor for ovarian and breast cancer with BRCA mutation."),
-  "niraparib": ("C1557761", "Niraparib", "A PARP inhibitor for ovarian cancer maintenance therapy."),
-  "rucaparib": ("C1554562", "Rucaparib", "A PARP inhibitor for BRCA-mutated ovarian cancer."),
-  "lenvatinib": ("C1576431", "Lenvatinib", "A multikinase inhibitor used in thyroid carcinoma and hepatocellular carcinoma."),
-  "sorafenib": ("C1349073", "Sorafenib", "A multikinase inhibitor used for renal and liver cancers."),
-  "sunitinib": ("C1337139", "Sunitinib", "A tyrosine kinase inhibitor used for renal cell carcinoma and GIST."),
-  "regorafenib": ("C1578946", "Regorafenib", "A multi-kinase inhibitor used in colorectal cancer and GIST."),
-  "cabozantinib": ("C1569040", "Cabozantinib", "A tyrosine kinase inhibitor for medullary thyroid and renal carcinomas."),
-  
-  # Biologics / Immunomodulators
-  "adalimumab": ("C0021203", "Adalimumab", "A TNF-alpha inhibitor monoclonal antibody used in rheumatoid arthritis and psoriasis."),
-  "infliximab": ("C0021217", "Infliximab", "A TNF-alpha inhibitor monoclonal antibody for Crohn's disease and arthritis."),
-  "etanercept": ("C0021309", "Etanercept", "A TNF receptor fusion protein used in autoimmune inflammatory diseases."),
-  "ustekinumab": ("C1578473", "Ustekinumab", "A monoclonal antibody against IL-12/23 (p40) used for psoriasis and psoriatic arthritis."),
-  "secukinumab": ("C1576773", "Secukinumab", "An IL-17A inhibitor monoclonal antibody for psoriasis and ankylosing spondylitis."),
-  "ixekizumab": ("C1555670", "Ixekizumab", "An IL-17A inhibitor monoclonal antibody used in psoriasis and psoriatic arthritis."),
-  "brodalumab": ("C1540648", "Brodalumab", "An IL-17 receptor A inhibitor for severe plaque psoriasis."),
-  "dupilumab": ("C1558429", "Dupilumab", "An IL-4 receptor alpha antagonist monoclonal antibody for asthma and eczema."),
-  "tildrakizumab": ("C1701713", "Tildrakizumab", "An IL-23 inhibitor monoclonal antibody for psoriasis."),
-  "risankizumab": ("C1701715", "Risankizumab", "An IL-23 inhibitor monoclonal antibody for plaque psoriasis."),
-  "tocilizumab": ("C0034061", "Tocilizumab", "An IL-6 receptor antagonist monoclonal antibody used for rheumatoid arthritis."),
-  "sarilumab": ("C1576879", "Sarilumab", "An IL-6 receptor antagonist monoclonal antibody for rheumatoid arthritis."),
-  "anakinra": ("C0024085", "Anakinra", "An IL-1 receptor antagonist used for rheumatoid arthritis and autoinflammatory syndromes."),
-  "belimumab": ("C1551497", "Belimumab", "A monoclonal antibody targeting B-lymphocyte stimulator (BLyS) for systemic lupus erythematosus."),
-  "rituximab": ("C0035813", "Rituximab", "An anti-CD20 monoclonal antibody used in B-cell lymphomas and autoimmune diseases."),
-  "vedolizumab": ("C1548296", "Vedolizumab", "An integrin inhibitor monoclonal antibody for inflammatory bowel disease."),
-  "tofacitinib": ("C3554708", "Tofacitinib", "A JAK inhibitor used to treat rheumatoid arthritis and other autoimmune conditions:contentReference[oaicite:10]{index=10}."),
-  "baricitinib": ("C3557265", "Baricitinib", "A JAK inhibitor for rheumatoid arthritis and recently for COVID-19."),
-  "upadacitinib": ("C3558577", "Upadacitinib", "A selective JAK1 inhibitor used for rheumatoid arthritis."),
-  "tepoxalin": ("C1544755", "Tepoxalin", "A dual COX/5-LOX inhibitor used in veterinary medicine (for context of rare NSAIDs)."),
-  
-  # Psychiatric medications
-  "risperidone": ("C0005584", "Risperidone", "An atypical antipsychotic used in schizophrenia and bipolar disorder."),
-  "brexpiprazole": ("C1557767", "Brexpiprazole", "A serotonin–dopamine activity modulator for schizophrenia and major depression."),
-  "lurasidone": ("C1572389", "Lurasidone", "An atypical antipsychotic for schizophrenia and bipolar depression."),
-  "asenapine": ("C1558209", "Asenapine", "An atypical antipsychotic administered sublingually, used for schizophrenia and bipolar disorder."),
-  "esketamine": ("C1701807", "Esketamine", "An NMDA receptor antagonist nasal spray for treatment-resistant depression."),
-  "cariprazine": ("C1541378", "Cariprazine", "An atypical antipsychotic for schizophrenia and bipolar mania."),
-  
-  # Endocrine and metabolic drugs
-  "dapagliflozin": ("C1577772", "Dapagliflozin", "An SGLT2 inhibitor for type 2 diabetes and heart failure."),
-  "empagliflozin": ("C1577771", "Empagliflozin", "An SGLT2 inhibitor for type 2 diabetes and heart failure."),
-  "canagliflozin": ("C1577769", "Canagliflozin", "An SGLT2 inhibitor for type 2 diabetes, reduces cardiovascular risk."),
-  "liraglutide": ("C1557395", "Liraglutide", "A GLP-1 receptor agonist for type 2 diabetes and obesity."),
-  "semaglutide": ("C1557404", "Semaglutide", "A GLP-1 receptor agonist for type 2 diabetes and obesity."),
-  "exenatide": ("C1546440", "Exenatide", "A GLP-1 receptor agonist for type 2 diabetes."),
-  "levothyroxine": ("C0027356", "Levothyroxine", "A synthetic thyroid hormone used to treat hypothyroidism."),
-  
-  # Cardiovascular drugs
-  "alirocumab": ("C1578504", "Alirocumab", "A PCSK9 inhibitor monoclonal antibody for lowering LDL cholesterol."),
-  "evolocumab": ("C1578506", "Evolocumab", "A PCSK9 inhibitor monoclonal antibody to reduce cholesterol levels."),
-  "apixaban": ("C1558944", "Apixaban", "An oral factor Xa inhibitor anticoagulant for atrial fibrillation and VTE."),
-  "rivaroxaban": ("C1558936", "Rivaroxaban", "An oral factor Xa inhibitor anticoagulant for thrombosis and stroke prevention."),
-  "dabigatran": ("C1559003", "Dabigatran", "An oral direct thrombin inhibitor anticoagulant."),
-  "bempedoic acid": ("C1557861", "Bempedoic Acid", "An ATP-citrate lyase inhibitor to lower LDL cholesterol."),
-  
-  # Other notable drugs
-  "linezolid": ("C0024174", "Linezolid", "An oxazolidinone antibiotic for Gram-positive infections."),
-  "metronidazole": ("C0026184", "Metronidazole", "An antibiotic effective against anaerobic bacteria and protozoa."),
-  "trimethoprim/sulfamethoxazole": ("C0024749", "Trimethoprim-Sulfamethoxazole", "A combination antibiotic for UTIs, pneumonia (Pneumocystis) and other infections."),
-  "isoniazid": ("C0020839", "Isoniazid", "First-line antitubercular medication."),
-  "rifampin": ("C0036051", "Rifampin", "A rifamycin antibiotic used in tuberculosis treatment."),
-  "ethambutol": ("C0002963", "Ethambutol", "An antimycobacterial agent used in tuberculosis therapy."),
-  "pyrazinamide": ("C0034149", "Pyrazinamide", "An antitubercular drug used with isoniazid and rifampin."),
-  
-  # Diseases and conditions
-  "systemic lupus erythematosus": ("C0024141", "Systemic Lupus Erythematosus", "An autoimmune disease in which the immune system attacks multiple organs:contentReference[oaicite:11]{index=11}."),
-  "rheumatoid arthritis": ("C0003873", "Rheumatoid Arthritis", "A chronic autoimmune disorder causing inflammation of joints:contentReference[oaicite:12]{index=12}."),
-  "multiple sclerosis": ("C0026769", "Multiple Sclerosis", "A demyelinating disease of the central nervous system:contentReference[oaicite:13]{index=13}."),
-  "amyotrophic lateral sclerosis": ("C0002736", "Amyotrophic Lateral Sclerosis", "A progressive neurodegenerative disease affecting motor neurons:contentReference[oaicite:14]{index=14}."),
-  "guillain-barre syndrome": ("C0019321", "Guillain-Barr Syndrome", "An acute autoimmune neuropathy causing rapid muscle weakness:contentReference[oaicite:15]{index=15}."),
-  "myasthenia gravis": ("C0027051", "Myasthenia Gravis", "A chronic autoimmune neuromuscular disease characterized by muscle weakness."),
-  "huntington disease": ("C0020179", "Huntington Disease", "A genetic neurodegenerative disorder causing movement, cognitive, and psychiatric disturbances."),
-  "parkinson disease": ("C0030567", "Parkinson Disease", "A neurodegenerative disorder characterized by tremor, rigidity, and bradykinesia."),
-  "alzheimer disease": ("C0002395", "Alzheimer Disease", "A neurodegenerative disease causing dementia and cognitive decline."),
-  "sarcoidosis": ("C0033866", "Sarcoidosis", "An inflammatory disease characterized by granulomas in multiple organs, especially lungs."),
-  "systemic sclerosis": ("C0036161", "Systemic Sclerosis", "An autoimmune connective tissue disease causing skin and organ fibrosis."),
-  "hashimoto thyroiditis": ("C0021642", "Hashimoto Thyroiditis", "An autoimmune thyroid disorder causing hypothyroidism."),
-  "graves disease": ("C0017725", "Graves Disease", "An autoimmune disorder causing hyperthyroidism and goiter."),
-  "addison disease": ("C0002651", "Addison Disease", "Primary adrenal insufficiency, often autoimmune, causing cortisol deficiency."),
-  "cushing syndrome": ("C0007873", "Cushing Syndrome", "A condition caused by chronic high cortisol, often from steroids or adrenal tumor."),
-  "diabetes mellitus type 1": ("C0011860", "Diabetes Mellitus Type 1", "An autoimmune destruction of pancreatic beta cells leading to insulin deficiency."),
-  "diabetes mellitus type 2": ("C0011860", "Diabetes Mellitus Type 2", "A metabolic disorder characterized by insulin resistance and relative insulin deficiency."),
-  "polycystic ovary syndrome": ("C0030305", "Polycystic Ovary Syndrome", "An endocrine disorder causing ovulatory dysfunction and hyperandrogenism."),
-  "cystic fibrosis": ("C0010674", "Cystic Fibrosis", "A genetic disorder affecting chloride channels, causing thick mucus in lungs and GI tract."),
-  "sickle cell anemia": ("C0023433", "Sickle Cell Anemia", "A hereditary hemoglobinopathy causing sickle-shaped red blood cells and vaso-occlusion."),
-  "beta thalassemia": ("C0005842", "Beta Thalassemia", "A genetic disorder causing reduced beta-globin production and anemia."),
-  "gauchers disease": ("C0027817", "Gaucher Disease", "A lysosomal storage disorder caused by glucocerebrosidase deficiency."),
-  "tay sachs disease": ("C0032451", "Tay-Sachs Disease", "A lysosomal storage disorder caused by hexosaminidase A deficiency, leading to neurodegeneration."),
-  "pompe disease": ("C0029363", "Pompe Disease", "A glycogen storage disorder (acid maltase deficiency) affecting heart and muscles."),
-  "fabry disease": ("C0016167", "Fabry Disease", "A lysosomal storage disorder caused by alpha-galactosidase A deficiency."),
-  "metachromatic leukodystrophy": ("C0025595", "Metachromatic Leukodystrophy", "A genetic disorder causing myelin sheath degeneration in nerves."),
-  "amyloidosis": ("C0004491", "Amyloidosis", "A group of conditions where misfolded proteins deposit as amyloid in organs."),
-  "hemochromatosis": ("C1386814", "Hemochromatosis", "An iron overload disorder that can damage liver, heart, and pancreas."),
-  "wilsons disease": ("C0042377", "Wilson Disease", "A genetic disorder causing copper accumulation, leading to liver and neurological disease."),
-  "phenylketonuria": ("C0037356", "Phenylketonuria", "An inherited metabolic disorder causing phenylalanine accumulation."),
-  "maple syrup urine disease": ("C0521488", "Maple Syrup Urine Disease", "An inherited disorder causing branched-chain amino acid accumulation."),
-  "mucopolysaccharidosis": ("C0430027", "Mucopolysaccharidosis", "A group of inherited metabolic disorders affecting glycosaminoglycan breakdown."),
-  
-  # Infectious diseases
-  "tuberculosis": ("C0041296", "Tuberculosis", "A chronic infectious disease caused by Mycobacterium tuberculosis, usually affecting lungs."),
-  "leprosy": ("C0024109", "Leprosy", "A chronic infection by Mycobacterium leprae affecting skin and nerves."),
-  "dengue fever": ("C0019221", "Dengue Fever", "A mosquito-borne viral infection causing fever, rash, and severe joint pain."),
-  "ebola hemorrhagic fever": ("C0019041", "Ebola Virus Disease", "A severe viral hemorrhagic fever with high mortality."),
-  "sars": ("C0036790", "Severe Acute Respiratory Syndrome", "A viral respiratory illness caused by a coronavirus, first identified in 2003."),
-  "mers": ("C3534218", "Middle East Respiratory Syndrome", "A viral respiratory disease caused by the MERS coronavirus."),
-  "lyme disease": ("C0024651", "Lyme Disease", "An infectious disease caused by Borrelia burgdorferi, transmitted by ticks."),
-  "zika virus infection": ("C3547502", "Zika Virus Infection", "A mosquito-borne viral disease that can cause birth defects."),
-  "chikungunya": ("C0008034", "Chikungunya", "A mosquito-borne viral disease causing fever and joint pain."),
-  "malaria": ("C0025289", "Malaria", "A mosquito-borne parasitic infection causing cyclical fevers and anemia."),
-  "influenza": ("C0021400", "Influenza", "An acute respiratory viral infection caused by influenza viruses."),
-  
-  # Cancers (disease names)
-  "acute lymphoblastic leukemia": ("C0005612", "Acute Lymphoblastic Leukemia", "A rapidly progressing cancer of lymphoid lineage, common in children."),
-  "acute myeloid leukemia": ("C0022694", "Acute Myeloid Leukemia", "A rapidly progressing cancer of myeloid blood cells."),
-  "chronic lymphocytic leukemia": ("C0007797", "Chronic Lymphocytic Leukemia", "A slow-growing cancer of B lymphocytes in adults."),
-  "chronic myeloid leukemia": ("C0007786", "Chronic Myeloid Leukemia", "A myeloproliferative neoplasm associated with the BCR-ABL fusion gene."),
-  "multiple myeloma": ("C0002645", "Multiple Myeloma", "A malignant proliferation of plasma cells in the bone marrow."),
-  "hodgkin lymphoma": ("C0019204", "Hodgkin Lymphoma", "A cancer of the lymphatic system characterized by Reed-Sternberg cells."),
-  "non-hodgkin lymphoma": ("C0024017", "Non-Hodgkin Lymphoma", "A diverse group of lymphoid cancers without Reed-Sternberg cells."),
-  "melanoma": ("C0025202", "Melanoma", "A malignant skin tumor arising from melanocytes."),
-  "breast cancer": ("C0006142", "Breast Cancer", "A malignant tumor of breast tissue, often adenocarcinoma."),
-  "prostate cancer": ("C0033578", "Prostate Cancer", "A malignant tumor of the prostate gland."),
-  "lung cancer": ("C0024121", "Lung Cancer", "A malignant lung tumor, commonly small cell or non-small cell carcinoma."),
-  "colon cancer": ("C0007102", "Colorectal Carcinoma", "A malignant tumor of the colon or rectum."),
-  "pancreatic cancer": ("C0039731", "Pancreatic Carcinoma", "A malignant tumor arising from the pancreatic exocrine cells."),
-  "hepatocellular carcinoma": ("C0007109", "Hepatocellular Carcinoma", "A primary liver cancer arising from hepatocytes."),
-  "glioblastoma": ("C0242339", "Glioblastoma", "A highly malignant primary brain tumor (astrocytoma)."),
-  "melanoma, uveal": ("C0041431", "Uveal Melanoma", "A malignant melanoma of the eye's uveal tract."),
-  "carcinoid tumor": ("C0007091", "Carcinoid Tumor", "A slow-growing neuroendocrine tumor often of the gastrointestinal tract or lungs."),
-  
-  # Other conditions
-  "acute respiratory distress syndrome": ("C0003392", "Acute Respiratory Distress Syndrome", "A severe form of lung injury causing respiratory failure."),
-  "acute kidney injury": ("C0002907", "Acute Kidney Injury", "A sudden decline in renal function, previously called acute renal failure."),
-  "chronic kidney disease": ("C0010970", "Chronic Kidney Disease", "Long-term loss of kidney function leading to renal failure."),
-  "metabolic syndrome": ("C0457199", "Metabolic Syndrome", "A cluster of conditions (hypertension, dyslipidemia, etc.) increasing cardiovascular risk."),
-  "polymyalgia rheumatica": ("C0022810", "Polymyalgia Rheumatica", "An inflammatory syndrome causing muscle pain and stiffness in older adults."),
-  "temporal arteritis": ("C0041832", "Temporal Arteritis", "An inflammatory disease of large blood vessels (giant cell arteritis) often causing headache."),
-  "factor v leiden thrombophilia": ("C1866765", "Factor V Leiden Thrombophilia", "A genetic mutation causing hypercoagulability due to Factor V resistance."),
-  "paroxysmal nocturnal hemoglobinuria": ("C0205383", "Paroxysmal Nocturnal Hemoglobinuria", "An acquired hematopoietic stem cell disorder causing hemolysis."),
-  "antiphospholipid syndrome": ("C0021309", "Antiphospholipid Syndrome", "An autoimmune disorder causing thrombosis due to antibodies against phospholipids."),
-  "hemophagocytic lymphohistiocytosis": ("C0027653", "Hemophagocytic Lymphohistiocytosis", "An aggressive immune activation syndrome causing fever and cytopenias."),
-}
-
-MEDICAL_TERMS = {
-  # Drugs (generic and brand)
-  "amoxicillin": ("C0002637", "Amoxicillin", "A broad-spectrum penicillin antibiotic used to treat various infections."),
-  "ceftaroline": ("C0564627", "Ceftaroline", "A cephalosporin antibiotic effective against MRSA, used for skin and respiratory infections:contentReference[oaicite:8]{index=8}."),
-}
+MEDICAL_TERMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "medical_terms.json")
+
+def load_medical_terms(path: str = MEDICAL_TERMS_PATH) -> Dict[str, tuple]:
+    # term -> (CUI, preferred name, definition)
+    with open(path, encoding="utf-8") as f:
+        return {term: tuple(entry) for term, entry in json.load(f).items()}
+
+MEDICAL_TERMS = load_medical_terms()
+
+# Per-process model used by multi-worker CPU inference
+_WORKER_NER = None
+
+def _init_worker(init_kwargs: dict, threads: int, core_queue):
+    # Pin the worker to its own core subset and load a private model
+    global _WORKER_NER
+    cores = core_queue.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    _WORKER_NER = MedicalNERLLM(**init_kwargs)
+
+def _predict_chunk(args):
+    prompts, batch_size, min_score = args
+    return _WORKER_NER.batch_predict(prompts, batch_size, min_score)
 
 class MedicalNERLLM:
-    def __init__(self, model_name: str = "blaze999/Medical-NER", device: str = None):
+    SUPPORTED_BACKENDS = ("torch", "ort", "ov", "trt")
+    DTYPES = {"fp32": torch.float32, "fp16": torch.float16}
+    # Sequence lengths the compiled forward is specialized on
+    SEQ_BUCKETS = (64, 128, 256, 512)
+    # Chit-chat that never holds an entity; matched after lowercasing and stripping punctuation
+    SMALL_TALK = frozenset({
+        "hi", "hello", "hey", "thanks", "thank you", "ok", "okay", "yes", "no", "bye",
+        "goodbye", "good morning", "good afternoon", "good evening", "xin chào", "cảm ơn"
+    })
+    # Largest batch the TensorRT engine is built for
+    TRT_MAX_BATCH = 32
+
+    def __init__(self, model_name: str = "blaze999/Medical-NER", device: str = None,
+                 compile_model: bool = False, backend: str = "torch", export_dir: str = None,
+                 dtype: str = None, quantize: bool = False, cache_size: int = 4096,
+                 num_workers: int = 1, cuda_graphs: bool = False):
+        if backend not in self.SUPPORTED_BACKENDS:
+            raise ValueError(f"Unsupported backend '{backend}', expected one of {self.SUPPORTED_BACKENDS}")
         self.model_name = model_name
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         self.device = device
+        if backend == "trt" and device != "cuda":
+            raise ValueError("The TensorRT backend requires a CUDA device")
+        self.backend = backend
+        self.export_dir = export_dir
+
+        # FP16 on GPU by default; CPU stays FP32 and can use INT8 dynamic quantization instead
+        if dtype is None:
+            dtype = "fp16" if device == "cuda" else "fp32"
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {tuple(self.DTYPES)}")
+        if dtype == "fp16" and device != "cuda":
+            print("FP16 inference is not supported on CPU, falling back to FP32")
+            dtype = "fp32"
+        self.dtype = dtype
+        if quantize and device != "cpu":
+            print("INT8 dynamic quantization is only supported on CPU, ignoring quantize=True")
+            quantize = False
+        self.quantize = quantize
 
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForTokenClassification.from_pretrained(model_name).to(self.device)
+        # In-process inference lets the Rust tokenizer use all cores for batch encoding unless
+        # configured otherwise; the worker pool path leaves the setting to the caller
+        if num_workers <= 1:
+            os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if not self.tokenizer.is_fast:
+            raise ValueError(f"No fast (Rust) tokenizer available for {model_name}")
+        self.model = self._load_model()
+        # ONNX Runtime / OpenVINO models are placed by their provider, not by the pipeline
+        on_torch = backend in ("torch", "trt")
+        pipeline_kwargs = {"device": 0 if device == "cuda" else -1} if on_torch else {}
         self.ner_pipeline = pipeline(
             "ner",
             model=self.model,
             tokenizer=self.tokenizer,
             aggregation_strategy="simple",
-            device=0 if device == "cuda" else -1
+            **pipeline_kwargs
         )
         
         self.important_tags = [
@@ -230,33 +115,325 @@ class MedicalNERLLM:
         ]
         
         self.max_length = 512
+        # The pipeline truncates to model_max_length during its own tokenization
+        self.tokenizer.model_max_length = self.max_length
         self.min_term_length = 3
+        self._token_re = re.compile(rf'\b\w{{{self.min_term_length},}}\b')
+        self._term_set = frozenset(MEDICAL_TERMS)
+
+        # Normalize the dictionary keys once instead of on every fuzzy lookup
+        self._term_keys = list(MEDICAL_TERMS.keys())
+        self._term_keys_processed = [utils.default_process(key) for key in self._term_keys]
+        self._build_term_matcher()
+
+        # Predictions keyed by (prompt, min_score); repeated prompts skip the model entirely
+        self._cache = LRUCache(cache_size)
+
+        # CPU workers load the same model; the parent process keeps the prediction cache
+        self.num_workers = num_workers
+        self._pool = None
+        self._worker_kwargs = dict(
+            model_name=model_name, device="cpu", compile_model=compile_model, backend=backend,
+            export_dir=export_dir, dtype=dtype, quantize=quantize, cache_size=0
+        )
+
+        self.compile_model = compile_model and backend == "torch"
+        # torch.compile's reduce-overhead mode already replays CUDA graphs
+        self.cuda_graphs = (cuda_graphs and backend == "torch" and device == "cuda"
+                            and not self.compile_model)
+        if self.compile_model:
+            self._compile()
+        elif self.cuda_graphs:
+            self._enable_cuda_graphs()
+
+    def _load_model(self):
+        if self.backend in ("torch", "trt"):
+            try:
+                # Fused scaled_dot_product_attention kernels where the architecture supports them
+                model = AutoModelForTokenClassification.from_pretrained(
+                    self.model_name, attn_implementation="sdpa"
+                )
+            except (ValueError, ImportError):
+                model = AutoModelForTokenClassification.from_pretrained(self.model_name)
+            # Inference only: no dropout and no autograd bookkeeping on the weights
+            model.eval()
+            model.requires_grad_(False)
+            if self.quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            elif self.dtype == "fp16":
+                model = model.half()
+            model = model.to(self.device)
+            if self.backend == "trt":
+                self._build_trt(model)
+            return model
+
+        if self.backend == "ort":
+            from optimum.onnxruntime import ORTModelForTokenClassification as model_cls
+            provider = "CUDAExecutionProvider" if self.device == "cuda" else "CPUExecutionProvider"
+            model_kwargs = {"provider": provider}
+        else:
+            from optimum.intel import OVModelForTokenClassification as model_cls
+            model_kwargs = {}
+
+        # Reuse a previously exported graph so later loads skip conversion
+        exported = self.export_dir is not None and os.path.isdir(self.export_dir)
+        if self.backend == "ov" and self.quantize and not exported:
+            from optimum.intel import OVWeightQuantizationConfig
+            model_kwargs["quantization_config"] = OVWeightQuantizationConfig(bits=8)
+        model = model_cls.from_pretrained(
+            self.export_dir if exported else self.model_name,
+            export=not exported,
+            **model_kwargs
+        )
+        if self.export_dir is not None and not exported:
+            model.save_pretrained(self.export_dir)
+        if self.backend == "ort" and self.quantize:
+            model = self._quantize_ort(model, model_cls, model_kwargs)
+        return model
+
+    def _build_trt(self, model):
+        import torch_tensorrt
+
+        # One engine with dynamic batch and sequence dimensions, optimized for mid-size batches
+        shape = dict(min_shape=(1, 1), opt_shape=(8, 128), max_shape=(self.TRT_MAX_BATCH, 512))
+        inputs = [torch_tensorrt.Input(**shape, dtype=torch.int64) for _ in range(2)]
+        precisions = {torch.float16} if self.dtype == "fp16" else {torch.float32}
+        engine = torch_tensorrt.compile(
+            model.eval(), ir="dynamo", inputs=inputs, enabled_precisions=precisions
+        )
+
+        def forward(input_ids=None, attention_mask=None, **kwargs):
+            # Single-segment NER inputs: token_type_ids are all zeros and not engine inputs
+            if attention_mask is None:
+                attention_mask = torch.ones_like(input_ids)
+            outputs = engine(input_ids, attention_mask)
+            logits = outputs["logits"] if isinstance(outputs, dict) else outputs[0]
+            return TokenClassifierOutput(logits=logits)
+
+        # The pipeline keeps calling the HF model, whose forward now runs the engine
+        model.forward = forward
+
+    def _quantize_ort(self, model, model_cls, model_kwargs):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        # Dynamic INT8 weights, computed once and cached next to the exported model
+        save_dir = os.path.join(self.export_dir or model.model_save_dir, "int8")
+        if not os.path.isdir(save_dir):
+            quantizer = ORTQuantizer.from_pretrained(model)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+        return model_cls.from_pretrained(save_dir, file_name="model_quantized.onnx", **model_kwargs)
+
+    def _compile(self):
+        # Pad every sequence to a fixed bucket so the compiled graphs are reused
+        # instead of recompiling for each prompt length
+        self._buckets = [b for b in self.SEQ_BUCKETS if b < self.max_length] + [self.max_length]
+        self._inner_forward = torch.compile(self.model.forward, mode="reduce-overhead", fullgraph=False)
+        self.model.forward = self._bucketed_forward
+
+        # Warm up one graph per bucket so the first requests do not pay for compilation
+        with torch.inference_mode():
+            for bucket in self._buckets:
+                dummy = torch.full((1, bucket), self.tokenizer.pad_token_id or 0, device=self.device)
+                self.model(input_ids=dummy, attention_mask=torch.ones_like(dummy))
+
+    def _enable_cuda_graphs(self):
+        # Bucketed shapes make each (batch, length) forward replayable as one CUDA graph
+        self._buckets = [b for b in self.SEQ_BUCKETS if b < self.max_length] + [self.max_length]
+        self._eager_forward = self.model.forward
+        self._graphs = {}
+        self._graph_pool = torch.cuda.graph_pool_handle()
+        self._inner_forward = self._forward_graph
+        self.model.forward = self._bucketed_forward
+
+    def _forward_graph(self, **inputs):
+        key = tuple((name, tuple(value.shape)) for name, value in sorted(inputs.items()))
+        if key not in self._graphs:
+            static_inputs = {name: value.clone() for name, value in inputs.items()}
+
+            # Warm up on a side stream before capture, as required by CUDA graphs
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    self._eager_forward(**static_inputs)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph, pool=self._graph_pool):
+                static_logits = self._eager_forward(**static_inputs)["logits"]
+            self._graphs[key] = (graph, static_inputs, static_logits)
+
+        graph, static_inputs, static_logits = self._graphs[key]
+        for name, value in inputs.items():
+            static_inputs[name].copy_(value)
+        graph.replay()
+        return TokenClassifierOutput(logits=static_logits)
+
+    def _bucketed_forward(self, input_ids=None, attention_mask=None, token_type_ids=None, **kwargs):
+        seq_len = input_ids.shape[1]
+        bucket = next((b for b in self._buckets if b >= seq_len), seq_len)
+        pad = bucket - seq_len
+        if pad:
+            input_ids = torch.nn.functional.pad(input_ids, (0, pad), value=self.tokenizer.pad_token_id or 0)
+            if attention_mask is not None:
+                attention_mask = torch.nn.functional.pad(attention_mask, (0, pad), value=0)
+            if token_type_ids is not None:
+                token_type_ids = torch.nn.functional.pad(token_type_ids, (0, pad), value=0)
+        if token_type_ids is not None:
+            kwargs["token_type_ids"] = token_type_ids
+
+        outputs = self._inner_forward(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+        # Drop the bucket padding so the pipeline sees logits for the real tokens only
+        return TokenClassifierOutput(logits=outputs["logits"][:, :seq_len])
     
     def correct_spelling(self, term: str, threshold: int = 95) -> str:
         term_lower = term.lower().strip()
-        if term_lower in MEDICAL_TERMS:
+        if term_lower in self._term_set:
             return term_lower
-        matches = process.extractOne(term_lower, MEDICAL_TERMS.keys(), score_cutoff=threshold)
+        matches = process.extractOne(
+            utils.default_process(term_lower),
+            self._term_keys_processed,
+            scorer=fuzz.WRatio,
+            processor=None,
+            score_cutoff=threshold
+        )
         if matches:
-            matched_term, score = matches
-            return matched_term
+            _, score, index = matches
+            return self._term_keys[index]
         return term
 
+    @contextmanager
+    def _inference_context(self):
+        # FP16 autocast lets the attention and Linear kernels run on tensor cores
+        autocast = self.backend == "torch" and self.device == "cuda" and self.dtype == "fp16"
+        with torch.inference_mode():
+            if autocast:
+                # Cached weight casts cannot be reused across CUDA graph replays
+                with torch.autocast(device_type="cuda", dtype=torch.float16,
+                                    cache_enabled=not self.cuda_graphs):
+                    yield
+            else:
+                yield
+
+    def _build_term_matcher(self):
+        # One automaton over all (including multi-word) terms, scanned once per prompt
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for key in self._term_keys:
+                self._automaton.add_word(key, key)
+            self._automaton.make_automaton()
+            self._term_re = None
+        else:
+            self._automaton = None
+            alternation = "|".join(re.escape(key) for key in sorted(self._term_keys, key=len, reverse=True))
+            self._term_re = re.compile(rf'\b(?:{alternation})\b')
+
+    def find_exact_terms(self, text: str) -> List[str]:
+        text = text.lower()
+        if self._automaton is None:
+            return self._term_re.findall(text)
+
+        found = []
+        for end, key in self._automaton.iter(text):
+            start = end - len(key) + 1
+            # Only whole-word hits, like the regex \b boundaries
+            if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+                continue
+            if end + 1 < len(text) and (text[end + 1].isalnum() or text[end + 1] == "_"):
+                continue
+            found.append(key)
+        return found
+
+    def match_terms(self, terms: List[str], threshold: int = 95) -> List[str]:
+        # Exact hits first; every remaining token is scored against all keys in one cdist call
+        unique = list(dict.fromkeys(term.lower().strip() for term in terms))
+        matched = [term for term in unique if term in self._term_set]
+        misses = [term for term in unique if term not in self._term_set]
+        if not misses:
+            return matched
+
+        scores = process.cdist(
+            [utils.default_process(term) for term in misses],
+            self._term_keys_processed,
+            scorer=fuzz.WRatio,
+            processor=None,
+            score_cutoff=threshold,
+            workers=-1
+        )
+        best = scores.argmax(axis=1)
+        for row, col in enumerate(best):
+            if scores[row, col] >= threshold:
+                matched.append(self._term_keys[col])
+        return matched
+
     def predict(self, prompt: str, min_score: float = 0.0) -> List[str]:
         if not prompt or not isinstance(prompt, str):
             return []
 
-        # Truncate if needed
-        tokens = self.tokenizer.encode(prompt, add_special_tokens=True)
-        if len(tokens) > self.max_length:
-            prompt = self.tokenizer.decode(tokens[:self.max_length-2], skip_special_tokens=True)
+        key = (prompt, min_score)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        if not self._needs_model(prompt):
+            result = self._postprocess(prompt, [], min_score)
+            self._cache.set(key, result)
+            return list(result)
 
         try:
-            entities = self.ner_pipeline(prompt)
+            with self._inference_context():
+                entities = self.ner_pipeline(prompt)
         except Exception as e:
             print(f"Error in NER pipeline: {e}")
-            entities = []
+            return self._postprocess(prompt, [], min_score)
+
+        result = self._postprocess(prompt, entities, min_score)
+        self._cache.set(key, result)
+        return list(result)
+
+    def _get_pool(self):
+        if self._pool is not None:
+            return self._pool
+
+        # Split the cores into one contiguous range per worker for cache locality
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        threads = max(1, len(cores) // self.num_workers)
 
+        ctx = multiprocessing.get_context("spawn")
+        core_queue = ctx.Queue()
+        for rank in range(self.num_workers):
+            core_queue.put(cores[rank * threads:(rank + 1) * threads])
+        self._pool = ctx.Pool(
+            self.num_workers,
+            initializer=_init_worker,
+            initargs=(self._worker_kwargs, threads, core_queue)
+        )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _needs_model(self, prompt: str) -> bool:
+        # Only punctuation-only prompts and known greetings skip the forward pass; short
+        # prompts such as "fever" are still typical medical queries
+        words = " ".join(re.findall(r"[^\W_]+", prompt.lower()))
+        return bool(words) and words not in self.SMALL_TALK
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _postprocess(self, prompt: str, entities: List[Dict], min_score: float = 0.0) -> List[str]:
         medical_terms = []
         
         # Get terms from NER
@@ -267,11 +444,9 @@ class MedicalNERLLM:
 
         # Fallback to dictionary matching if no terms found
         if not medical_terms:
-            terms = re.findall(rf'\b\w{{{self.min_term_length},}}\b', prompt.lower())
-            medical_terms = [
-                self.correct_spelling(term) for term in terms
-                if self.correct_spelling(term) in MEDICAL_TERMS
-            ]   
+            # Exact (multi-word) hits in one scan, fuzzy matching for the single tokens
+            medical_terms = self.find_exact_terms(prompt)
+            medical_terms += self.match_terms(self._token_re.findall(prompt.lower()))
 
         return list(set(medical_terms))
 
@@ -283,14 +458,80 @@ class MedicalNERLLM:
     def batch_predict(self, prompts: List[str], batch_size: int = 8, min_score: float = 0.0) -> List[List[str]]:
         if not prompts:
             return []
+        if self.backend == "trt":
+            batch_size = min(batch_size, self.TRT_MAX_BATCH)
             
-        results = []
-        for i in range(0, len(prompts), batch_size):
-            batch = prompts[i:i + batch_size]
-            batch_results = [self.predict(prompt, min_score) for prompt in batch]
-            results.extend(batch_results)
+        # Invalid prompts get no entities; cached prompts are answered without the model
+        results = [[] for _ in prompts]
+        misses = []
+        for i, prompt in enumerate(prompts):
+            if not prompt or not isinstance(prompt, str):
+                continue
+            cached = self._cache.get((prompt, min_score))
+            if cached is not None:
+                results[i] = list(cached)
+            elif not self._needs_model(prompt):
+                # No entity possible, see _needs_model
+                results[i] = self._postprocess(prompt, [], min_score)
+                self._cache.set((prompt, min_score), list(results[i]))
+            else:
+                misses.append(i)
+
+        # Large CPU workloads are sharded across the worker processes
+        if self.num_workers > 1 and self.device == "cpu" and len(misses) >= self.num_workers * batch_size:
+            chunk_size = -(-len(misses) // self.num_workers)
+            chunks = [misses[i:i + chunk_size] for i in range(0, len(misses), chunk_size)]
+            args = [([prompts[i] for i in chunk], batch_size, min_score) for chunk in chunks]
+            for chunk, chunk_results in zip(chunks, self._get_pool().map(_predict_chunk, args)):
+                for i, result in zip(chunk, chunk_results):
+                    results[i] = result
+                    self._cache.set((prompts[i], min_score), list(result))
+            return results
+
+        # Similar-length prompts share a batch, so each batch pads only to its own longest
+        # prompt; results are written back by index, which restores the input order
+        if len(misses) > batch_size:
+            encoded = self.tokenizer(
+                [prompts[i] for i in misses],
+                add_special_tokens=False,
+                truncation=True,
+                max_length=self.max_length
+            )["input_ids"]
+            order = sorted(range(len(misses)), key=lambda j: len(encoded[j]))
+            misses = [misses[j] for j in order]
+
+        # Only the misses go through the pipeline, streamed as one generator so it
+        # batches and preprocesses ahead of the forward pass
+        done = 0
+        try:
+            with self._inference_context():
+                texts = (prompts[i] for i in misses)
+                for entities in self.ner_pipeline(texts, batch_size=batch_size):
+                    i = misses[done]
+                    results[i] = self._postprocess(prompts[i], entities, min_score)
+                    self._cache.set((prompts[i], min_score), list(results[i]))
+                    done += 1
+        except Exception as e:
+            print(f"Error in NER pipeline: {e}")
+            for i in misses[done:]:
+                results[i] = self._postprocess(prompts[i], [], min_score)
         return results
 
-# medical_ner_llm = MedicalNERLLM()
+def get_medical_ner(model_name: str = "blaze999/Medical-NER", device: str = None, **kwargs) -> MedicalNERLLM:
+    # One shared instance per configuration, so repeated callers reuse the loaded model. Defaults
+    # are resolved first so the key does not depend on argument order or on explicit defaults.
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    bound = inspect.signature(MedicalNERLLM).bind(model_name=model_name, device=device, **kwargs)
+    bound.apply_defaults()
+    if bound.arguments["dtype"] is None:
+        bound.arguments["dtype"] = "fp16" if device == "cuda" else "fp32"
+    return _get_medical_ner(tuple(bound.arguments.items()))
+
+@lru_cache(maxsize=4)
+def _get_medical_ner(options: tuple) -> MedicalNERLLM:
+    return MedicalNERLLM(**dict(options))
+
+# medical_ner_llm = get_medical_ner()
 # question = 'How does obesity contribute to type 2 diabetes in individuals with a sedentary lifestyle'
 # medical_ner_llm.predict(question)
\ No newline at end of file
@@ -1,86 +1,168 @@
-import networkx as nx
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
 from umlsbert import UMLSBERT
 
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
 umlsbert = UMLSBERT()
 
+# Giới hạn token khi mã hóa: bộ ba UMLS thường < 20 token, câu hỏi dài bị cắt ở 128
+RELATION_MAX_LENGTH = 64
+QUERY_MAX_LENGTH = 128
+
+# Đồ thị con quá ít cạnh thì PPR không thêm thông tin; thành phần chứa main_entity quá ít nút thì chỉ chạy PPR trên nó
+PPR_MIN_EDGES = 5
+PPR_MIN_COMPONENT = 3
+
+def _l2_normalize(embeddings):
+    # Chuẩn hóa L2 theo hàng để tích vô hướng chính là cosine similarity (vector 0 giữ nguyên)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+def _cosine_matrix(a, b):
+    # Ma trận cosine similarity giữa các hàng của a và b; dùng kernel SIMD của SimSIMD (f32) nếu có
+    if simsimd is not None and len(a) and len(b):
+        a = np.ascontiguousarray(a, dtype=np.float32)
+        b = np.ascontiguousarray(b, dtype=np.float32)
+        return 1.0 - np.asarray(simsimd.cdist(a, b, metric="cosine"))
+    return _l2_normalize(a) @ _l2_normalize(b).T
+
+def _triplet_text(rel):
+    # Chuỗi "e_i r e_j" của bộ ba; không ghi gì vào dict của người gọi
+    return f"{rel.get('relatedFromIdName', '')} {rel.get('additionalRelationLabel', '').replace('_', ' ')} {rel.get('relatedIdName', '')}"
+
+def encode_relations(query, relations):
+    # Mã hóa câu hỏi và các bộ ba một lần để dùng chung cho cả ba hàm xếp hạng
+    relation_texts = [_triplet_text(rel) for rel in relations]
+    query_embedding = umlsbert.batch_encode([query], max_length=QUERY_MAX_LENGTH)[0]
+    if not relation_texts:
+        return query_embedding, np.empty((0, query_embedding.shape[-1]), dtype=query_embedding.dtype)
+    return query_embedding, umlsbert.batch_encode(relation_texts, max_length=RELATION_MAX_LENGTH)
+
+def _resolve_embeddings(query, relations, query_embedding, relation_embeddings):
+    # Dùng embedding truyền vào nếu có, nếu không thì tự mã hóa
+    if query_embedding is None or relation_embeddings is None:
+        return encode_relations(query, relations)
+    return query_embedding, relation_embeddings
+
+def _top_k_indices(scores, top_k):
+    # Chọn top_k chỉ số có điểm cao nhất bằng argpartition (O(N)) thay vì sắp xếp toàn bộ;
+    # giữ mọi phần tử bằng ngưỡng để thứ tự khi hòa điểm giống hệt sắp xếp ổn định
+    scores = np.asarray(scores)
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < scores.size:
+        threshold = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(scores.size)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:top_k]
+
+def _personalized_pagerank(edges, personalization, alpha=0.85, max_iter=100, tol=1e-6):
+    # Lặp lũy thừa trên ma trận thưa, cùng công thức với nx.pagerank: cạnh trùng gộp lại,
+    # trọng số chuẩn hóa theo bậc ra, nút cụt phân phối lại theo vector cá nhân hóa
+    nodes = list(personalization)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    node_ids = {node: i for i, node in enumerate(nodes)}
+    edge_ids = np.array(sorted({(node_ids[u], node_ids[v]) for u, v in edges}), dtype=np.int64).reshape(-1, 2)
+    A = sp.csr_matrix((np.ones(len(edge_ids)), (edge_ids[:, 0], edge_ids[:, 1])), shape=(n, n))
+
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    is_dangling = out_degree == 0
+    inv_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~is_dangling)
+    # P^T để mỗi vòng lặp chỉ là một phép nhân ma trận thưa với vector
+    P_T = (sp.diags(inv_degree) @ A).T.tocsr()
+
+    v = np.array([personalization[node] for node in nodes], dtype=np.float64)
+    v /= v.sum()
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        x_prev = x
+        x = alpha * (P_T @ x_prev + x_prev[is_dangling].sum() * v) + (1 - alpha) * v
+        if np.abs(x - x_prev).sum() < n * tol:
+            break
+    return dict(zip(nodes, x))
+
+def _weak_component(edges, nodes, source):
+    # Tập nút thuộc thành phần liên thông yếu chứa source
+    node_ids = {node: i for i, node in enumerate(nodes)}
+    rows = [node_ids[u] for u, _ in edges]
+    cols = [node_ids[v] for _, v in edges]
+    A = sp.csr_matrix((np.ones(len(edges)), (rows, cols)), shape=(len(node_ids), len(node_ids)))
+    _, labels = connected_components(A, directed=True, connection="weak")
+    source_label = labels[node_ids[source]]
+    return {node for node, label in zip(node_ids, labels) if label == source_label}
+
 # PPR Ranking
-def ppr_ranking(query, relations, main_entity, top_k=150):
-    # Mã hóa câu hỏi và bộ ba bằng UmlsBERT
-    relation_texts = [f"{rel.get('relatedFromIdName', '')} {rel.get('additionalRelationLabel', '').replace('_', ' ')} {rel.get('relatedIdName', '')}" for rel in relations]
-    embeddings = umlsbert.batch_encode([query] + relation_texts)
-    query_embedding = embeddings[0]
-    relation_embeddings = embeddings[1:]
+def ppr_ranking(query, relations, main_entity, top_k=150, query_embedding=None, relation_embeddings=None):
+    # Mã hóa câu hỏi và bộ ba bằng UmlsBERT (hoặc dùng embedding đã tính bằng encode_relations)
+    query_embedding, relation_embeddings = _resolve_embeddings(query, relations, query_embedding, relation_embeddings)
     
     # Tính cosine similarity để khởi tạo trọng số
-    cos_sims = cosine_similarity([query_embedding], relation_embeddings)[0]
+    cos_sims = _cosine_matrix(relation_embeddings, query_embedding[None])[:, 0]
     weights = {rel.get("relatedIdName", ""): sim for rel, sim in zip(relations, cos_sims)}
     
-    # Xây dựng đồ thị con
-    G = nx.DiGraph()
-    for rel in relations:
-        e_i = rel.get("relatedFromIdName", "")
-        e_j = rel.get("relatedIdName", "")
-        r = rel.get("additionalRelationLabel", "").replace("_", " ")
-        G.add_edge(e_i, e_j, relation=r)
+    # Xây dựng đồ thị con (các nút theo thứ tự xuất hiện)
+    edges = [(rel.get("relatedFromIdName", ""), rel.get("relatedIdName", "")) for rel in relations]
+    nodes = dict.fromkeys(e for edge in edges for e in edge)
+
+    # Đồ thị suy biến: xếp hạng thẳng theo cosine similarity (giống similarity_score), bỏ qua PPR
+    if len(set(edges)) < PPR_MIN_EDGES or main_entity not in nodes:
+        return [relations[i] for i in _top_k_indices(cos_sims, top_k)]
+    component = _weak_component(edges, nodes, main_entity)
+    if len(component) < PPR_MIN_COMPONENT and len(component) < len(nodes):
+        # main_entity nằm trong một thành phần rất nhỏ: chỉ chạy PPR trên thành phần đó, bộ ba ngoài
+        # thành phần nhận điểm 0; còn lại chạy PPR trên toàn đồ thị như cũ
+        edges = [(u, v) for u, v in edges if u in component]
+        nodes = {e: None for e in nodes if e in component}
     
     # Chạy Personalized PageRank
-    personalization = {e: 1.0 if e == main_entity else weights.get(e, 0.1) for e in G.nodes}
-    pr = nx.pagerank(G, alpha=0.85, personalization=personalization, max_iter=100)
+    personalization = {e: 1.0 if e == main_entity else weights.get(e, 0.1) for e in nodes}
+    pr = _personalized_pagerank(edges, personalization, alpha=0.85, max_iter=100)
     
     # Xếp hạng bộ ba theo điểm PPR của e_j
-    ranked_rels = sorted(
-        [(pr.get(rel.get("relatedIdName", ""), 0), rel) for rel in relations],
-        key=lambda x: x[0],  # Sắp xếp theo điểm PPR
-        reverse=True
-    )[:top_k]
-
-    return [rel[1] for rel in ranked_rels]
+    ppr_scores = np.array([pr.get(rel.get("relatedIdName", ""), 0) for rel in relations], dtype=np.float64)
+    return [relations[i] for i in _top_k_indices(ppr_scores, top_k)]
 
 # MMR Ranking
-def get_similarity(query_emb, rel_emb):
-    from sklearn.metrics.pairwise import cosine_similarity
-    return cosine_similarity(query_emb, rel_emb)
-
-def most_similar_relation(query_embedding, relation_embeddings):
-    similarities = [get_similarity([query_embedding], [rel_emb]) for rel_emb in relation_embeddings]
-    index = similarities.index(max(similarities))
-    return index
-
-def calculate_rerank_scores(query_embedding, relation_embeddings, rerank_relations_indices, base_weight=0.1, delta_weight=0.01):
-    scores = []
-    for i, rel_emb in enumerate(relation_embeddings):
-        if i not in rerank_relations_indices:
-            query_similarity = get_similarity([query_embedding], [rel_emb])
-            
-            if rerank_relations_indices:
-                rel_similarities = [get_similarity([relation_embeddings[j]], [rel_emb]) for j in rerank_relations_indices]
-                avg_rel_similarity = sum(rel_similarities) / len(rel_similarities)
-            else:
-                avg_rel_similarity = 0
-            
-            weight_factor = base_weight + delta_weight * len(rerank_relations_indices)
-            
-            score = query_similarity - weight_factor * avg_rel_similarity
-            scores.append((i, score))
+def calculate_rerank_scores(q_sim, rel_sim_sum, rerank_relations_indices, base_weight=0.1, delta_weight=0.01):
+    # Điểm MMR của mọi ứng viên trong một phép tính; rel_sim_sum là tổng độ tương đồng tới các bộ ba
+    # đã chọn (cập nhật dần), các bộ ba đã chọn bị loại bằng -inf
+    avg_rel_similarity = rel_sim_sum / len(rerank_relations_indices)
+    weight_factor = base_weight + delta_weight * len(rerank_relations_indices)
+    scores = q_sim - weight_factor * avg_rel_similarity
+    scores[rerank_relations_indices] = -np.inf
     return scores
 
-def MMR_reranking(query, relations, top_k=10):
+def MMR_reranking(query, relations, top_k=10, query_embedding=None, relation_embeddings=None):
     rels = []
-    relation_texts = [query] + [f"{rel.get('relatedFromIdName', '')} {rel.get('additionalRelationLabel', '').replace('_', ' ')} {rel.get('relatedIdName', '')}" for rel in relations]
-    embeddings = umlsbert.batch_encode(relation_texts)
-    query_embedding = embeddings[0]
-    relation_embeddings = embeddings[1:]
-
-    rerank_relations_indices = [most_similar_relation(query_embedding, relation_embeddings)]
-
-    while len(rerank_relations_indices) < 20 and len(relation_embeddings) > len(rerank_relations_indices):
-        rerank_scores = calculate_rerank_scores(query_embedding, relation_embeddings, rerank_relations_indices)
-        rerank_scores.sort(key=lambda x: x[1], reverse=True)
-        for score in rerank_scores:
-            if score[0] not in rerank_relations_indices:
-                rerank_relations_indices.append(score[0])
-                break
+    if not relations:
+        return rels
+    query_embedding, relation_embeddings = _resolve_embeddings(query, relations, query_embedding, relation_embeddings)
+
+    # Tính trước độ tương đồng câu hỏi-bộ ba (N) và bộ ba-bộ ba (N x N) một lần
+    q_sim = _cosine_matrix(relation_embeddings, query_embedding[None])[:, 0]
+    rel_sim = _cosine_matrix(relation_embeddings, relation_embeddings)
+
+    rerank_relations_indices = [int(np.argmax(q_sim))]
+    # Tổng chạy: mỗi lần chọn chỉ cộng thêm một cột, O(N) thay vì tính lại trung bình trên k cột
+    rel_sim_sum = rel_sim[:, rerank_relations_indices[0]].astype(np.float64)
+
+    # Lựa chọn tham lam nên chỉ cần chọn đến top_k (tối đa 20) bộ ba
+    limit = min(top_k, 20, len(relations))
+    while len(rerank_relations_indices) < limit:
+        rerank_scores = calculate_rerank_scores(q_sim, rel_sim_sum, rerank_relations_indices)
+        pick = int(np.argmax(rerank_scores))
+        rerank_relations_indices.append(pick)
+        rel_sim_sum += rel_sim[:, pick]
     
     rerank_relations = [relations[i] for i in rerank_relations_indices]
     rerank_relations = rerank_relations[:top_k]
@@ -99,22 +181,14 @@ def MMR_reranking(query, relations, top_k=10):
 
     return rels
 
-def similarity_score(query, relations, top_k=10):
-    def get_similarity(query_emb, rel_emb):
-        from sklearn.metrics.pairwise import cosine_similarity
-        return cosine_similarity([query_emb], [rel_emb])[0][0]
-    
-    relation_texts = [query] + [f"{rel.get('relatedFromIdName', '')} {rel.get('additionalRelationLabel', '').replace('_', ' ')} {rel.get('relatedIdName', '')}" for rel in relations]
-    embeddings = umlsbert.batch_encode(relation_texts)
-    query_embedding = embeddings[0]
-    relation_embeddings = embeddings[1:]
+def similarity_score(query, relations, top_k=10, query_embedding=None, relation_embeddings=None):
+    query_embedding, relation_embeddings = _resolve_embeddings(query, relations, query_embedding, relation_embeddings)
     
-    relation_scores = [(get_similarity(query_embedding, rel_emb), rel) for rel_emb, rel in zip(relation_embeddings, relations)]
-    relation_scores.sort(key=lambda x: x[0], reverse=True)
-    rank_rels = relation_scores[:top_k]
+    cos_sims = _cosine_matrix(relation_embeddings, query_embedding[None])[:, 0]
+    rank_rels = [relations[i] for i in _top_k_indices(cos_sims, top_k)]
 
     rels = []
-    for _, rel in rank_rels:
+    for rel in rank_rels:
         rel = {
             "relatedFromIdName": rel.get("relatedFromIdName", ""),
             "additionalRelationLabel": rel.get("additionalRelationLabel", "").replace("_", " "),
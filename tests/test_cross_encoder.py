@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("diskcache")
+
+import cross_encoder
+
+WORDS = ["fever", "aspirin", "headache", "myocardial", "infarction", "treats", "isa", "may", "be", "treated", "by"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tiny-cross-encoder")
+    vocab = path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n")
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(vocab))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(tokenizer), hidden_size=16, num_hidden_layers=1,
+        num_attention_heads=2, intermediate_size=32, num_labels=1
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return str(path)
+
+
+def reference_scores(model_dir, pairs, max_length):
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir)
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    inputs = tokenizer(
+        [q for q, _ in pairs], [r for _, r in pairs],
+        truncation=True, padding=True, max_length=max_length, return_tensors="pt"
+    )
+    with torch.no_grad():
+        return model(**inputs).logits.flatten().numpy()
+
+
+@pytest.mark.parametrize("query_words", [3, 40])
+def test_scores_match_plain_pair_encoding(tiny_model_dir, query_words):
+    encoder = cross_encoder.UMLS_CrossEncoder(tiny_model_dir, device="cpu", batch_size=4, max_length=32)
+    rng = np.random.default_rng(query_words)
+    query = " ".join(rng.choice(WORDS, query_words))
+    rels = [" ".join(rng.choice(WORDS, rng.integers(1, 30))) for _ in range(13)]
+
+    scores = encoder.score(query, rels)
+    expected = reference_scores(tiny_model_dir, encoder.prepare_pairs(query, rels), 32)
+    assert np.abs(scores).sum() > 0
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+
+def test_failure_of_every_batch_is_raised(tiny_model_dir, monkeypatch):
+    encoder = cross_encoder.UMLS_CrossEncoder(tiny_model_dir, device="cpu", batch_size=2)
+
+    def broken(pairs):
+        raise ValueError("tokenizer API mismatch")
+
+    monkeypatch.setattr(encoder, "_score_batch", broken)
+    with pytest.raises(cross_encoder.BatchScoringError):
+        encoder.score("fever", ["aspirin treats fever", "headache", "may be treated by aspirin"])
+
+
+def test_long_query_keeps_batches_at_batch_size(tiny_model_dir, monkeypatch):
+    encoder = cross_encoder.UMLS_CrossEncoder(tiny_model_dir, device="cpu", batch_size=2)
+    sizes = []
+    score_batch = encoder._score_batch
+
+    def recording(pairs):
+        sizes.append(len(pairs))
+        return score_batch(pairs)
+
+    monkeypatch.setattr(encoder, "_score_batch", recording)
+    encoder.score(" ".join(["myocardial infarction"] * 20), ["aspirin treats fever"] + ["isa"] * 7)
+    assert max(sizes) <= 2
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("rapidfuzz")
+
+import ner
+
+
+class FakeTokenizer:
+    is_fast = True
+    model_max_length = 512
+
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, batch_size=None):
+        if isinstance(inputs, str):
+            self.calls.append(inputs)
+            return self._entities(inputs)
+        return self._stream(inputs)
+
+    def _stream(self, texts):
+        for text in texts:
+            self.calls.append(text)
+            yield self._entities(text)
+
+    @staticmethod
+    def _entities(text):
+        return [{"entity_group": "SIGN_SYMPTOM", "word": text.strip("?!. ").lower(), "score": 0.99}]
+
+
+@pytest.fixture
+def medical_ner(monkeypatch):
+    fake_pipeline = FakePipeline()
+    monkeypatch.setattr(ner.AutoTokenizer, "from_pretrained", staticmethod(lambda *args, **kwargs: FakeTokenizer()))
+    monkeypatch.setattr(ner.MedicalNERLLM, "_load_model", lambda self: object())
+    monkeypatch.setattr(ner, "pipeline", lambda *args, **kwargs: fake_pipeline)
+    return ner.MedicalNERLLM("fake-model", device="cpu"), fake_pipeline
+
+
+@pytest.mark.parametrize("prompt", ["fever", "headache", "asthma", "chest pain", "stroke", "aspirin?"])
+def test_short_medical_prompt_reaches_model(medical_ner, prompt):
+    model, fake_pipeline = medical_ner
+    assert model.predict(prompt) == [prompt.strip("?").lower()]
+    assert fake_pipeline.calls == [prompt]
+
+
+def test_batch_predict_sends_short_symptoms_to_model(medical_ner):
+    model, fake_pipeline = medical_ner
+    assert model.batch_predict(["fever", "hello", "migraine"]) == [["fever"], [], ["migraine"]]
+    assert fake_pipeline.calls == ["fever", "migraine"]
+
+
+@pytest.mark.parametrize("prompt", ["Hello!", "thank you", "???", "  "])
+def test_small_talk_and_punctuation_skip_model(medical_ner, prompt):
+    model, fake_pipeline = medical_ner
+    assert model.predict(prompt) == []
+    assert fake_pipeline.calls == []
+
+
+def test_medical_terms_load_from_json():
+    assert len(ner.MEDICAL_TERMS) > 150
+    assert ner.MEDICAL_TERMS["systemic lupus erythematosus"][0] == "C0024141"
+
+
+def test_get_medical_ner_shares_equivalent_configurations(medical_ner):
+    ner._get_medical_ner.cache_clear()
+    try:
+        model = ner.get_medical_ner(device="cpu")
+        assert ner.get_medical_ner("blaze999/Medical-NER", backend="torch", device="cpu") is model
+        assert ner.get_medical_ner(cache_size=4096, device="cpu", dtype="fp32") is model
+        assert ner.get_medical_ner(device="cpu", cache_size=8) is not model
+    finally:
+        ner._get_medical_ner.cache_clear()
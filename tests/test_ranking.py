@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("scipy")
+
+import umlsbert
+
+
+@pytest.fixture(scope="module")
+def ranking():
+    # ranking builds UMLSBERT() at import; the tests pass embeddings in, so no model is loaded
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(umlsbert.UMLSBERT, "__init__", lambda self: None)
+        import ranking
+    return ranking
+
+
+def make_relations(edges):
+    return [{"relatedFromIdName": u, "additionalRelationLabel": "may_treat", "relatedIdName": v} for u, v in edges]
+
+
+def embeddings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=16).astype(np.float32), rng.normal(size=(n, 16)).astype(np.float32)
+
+
+def full_graph_ranking(ranking, relations, main_entity, query_embedding, relation_embeddings, top_k):
+    # PPR over the whole graph, without splitting it into components
+    cos_sims = ranking._cosine_matrix(relation_embeddings, query_embedding[None])[:, 0]
+    weights = {rel["relatedIdName"]: sim for rel, sim in zip(relations, cos_sims)}
+    edges = [(rel["relatedFromIdName"], rel["relatedIdName"]) for rel in relations]
+    nodes = dict.fromkeys(e for edge in edges for e in edge)
+    personalization = {e: 1.0 if e == main_entity else weights.get(e, 0.1) for e in nodes}
+    pr = ranking._personalized_pagerank(edges, personalization)
+    scores = np.array([pr.get(rel["relatedIdName"], 0) for rel in relations])
+    return [relations[i] for i in ranking._top_k_indices(scores, top_k)]
+
+
+def test_large_main_component_ranks_on_full_graph(ranking):
+    edges = [("fever", "aspirin"), ("fever", "ibuprofen"), ("aspirin", "headache"), ("ibuprofen", "headache"),
+             ("headache", "migraine"), ("fever", "infection"), ("rash", "itching"), ("itching", "allergy")]
+    relations = make_relations(edges)
+    query_embedding, relation_embeddings = embeddings(len(relations))
+
+    ranked = ranking.ppr_ranking("fever", relations, "fever", top_k=len(relations),
+                                 query_embedding=query_embedding, relation_embeddings=relation_embeddings)
+
+    assert ranked == full_graph_ranking(ranking, relations, "fever", query_embedding, relation_embeddings, len(relations))
+
+
+def test_tiny_main_component_restricts_ppr(ranking):
+    edges = [("fever", "aspirin"), ("rash", "itching"), ("itching", "allergy"), ("allergy", "hives"),
+             ("hives", "rash"), ("rash", "eczema")]
+    relations = make_relations(edges)
+    query_embedding, relation_embeddings = embeddings(len(relations))
+
+    ranked = ranking.ppr_ranking("fever", relations, "fever", top_k=1,
+                                 query_embedding=query_embedding, relation_embeddings=relation_embeddings)
+
+    assert ranked == [relations[0]]
+
+
+def test_few_edges_rank_by_cosine(ranking):
+    relations = make_relations([("fever", "aspirin"), ("fever", "ibuprofen"), ("aspirin", "headache")])
+    query_embedding, relation_embeddings = embeddings(len(relations))
+
+    ranked = ranking.ppr_ranking("fever", relations, "fever", top_k=len(relations),
+                                 query_embedding=query_embedding, relation_embeddings=relation_embeddings)
+
+    cos_sims = ranking._cosine_matrix(relation_embeddings, query_embedding[None])[:, 0]
+    assert ranked == [relations[i] for i in np.argsort(-cos_sims, kind="stable")]
@@ -0,0 +1,52 @@
+import unicodedata
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("peft")
+pytest.importorskip("langdetect")
+
+import translation
+
+ACCENTED_ENGLISH = [
+    "What causes Guillain-Barré syndrome?",
+    "Treatment for Ménière's disease",
+    "café au lait spots",
+    "Is a naïve T cell involved in Crohn's disease?",
+]
+
+VIETNAMESE = [
+    "Sốt là dấu hiệu thường gặp khi cơ thể bị nhiễm trùng",
+    "Patient has sốt cao và đau đầu",
+    "BỆNH NHÂN ĐAU ĐẦU",
+]
+
+
+@pytest.fixture
+def detect_calls(monkeypatch):
+    calls = []
+
+    def fake_detect(text):
+        calls.append(text)
+        return "en"
+
+    monkeypatch.setattr(translation, "detect", fake_detect)
+    return calls
+
+
+@pytest.mark.parametrize("text", ACCENTED_ENGLISH)
+def test_accented_english_is_left_to_langdetect(detect_calls, text):
+    assert translation._needs_translation(text) is False
+    assert detect_calls == [text]
+
+
+@pytest.mark.parametrize("text", VIETNAMESE)
+def test_vietnamese_letters_skip_langdetect(detect_calls, text):
+    assert translation._needs_translation(text) is True
+    assert detect_calls == []
+
+
+def test_decomposed_vietnamese_is_detected(detect_calls):
+    assert translation._needs_translation(unicodedata.normalize("NFD", "bị đau bụng")) is True
+    assert detect_calls == []
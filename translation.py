@@ -9,6 +9,37 @@ from langdetect import detect
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Input lengths are padded up to one of these when the model is compiled, so the
+# compiled graphs are reused instead of re-traced for every new length
+SEQ_BUCKETS = (64, 128, 256, 512)
+
+# Letters specific to Vietnamese: ă đ ơ ư and their tone forms, the stacked circumflex+tone
+# forms, and the hook-above, dot-below and tilde-on-e/i/u/y tones (plus the matching combining
+# marks for decomposed text). Accents shared with French or Portuguese (à á â é ê ô ã ...) are
+# left out, so accented English such as "Guillain-Barré" still goes through langdetect
+_VI_CHARS = frozenset(
+    "ăằẳẵắặđơờởỡớợưừửữứự"
+    "ầẩẫấậềểễếệồổỗốộ"
+    "ảẻỉỏủỷạẹịọụỵẽĩũỹ"
+    "\u0306\u0309\u031b\u0323"
+)
+
+
+def _needs_translation(text: str) -> bool:
+    """
+    Return True if text is Vietnamese or mixed, False if it is pure English.
+    
+    Texts containing a Vietnamese-only letter are classified directly; all other texts,
+    including English with French-style accents, go through langdetect, which is far slower.
+    """
+    if not _VI_CHARS.isdisjoint(text.lower()):
+        return True
+    try:
+        return detect(text) != 'en'
+    except Exception:
+        # If detection fails, assume it needs translation
+        return True
+
 class EnViT5Translator:
     """
     A class for Vietnamese to English translation using EnViT5 model.
@@ -19,42 +50,132 @@ class EnViT5Translator:
     Attributes:
         device (str): The device to run the model on ('cuda' or 'cpu')
         max_length (int): Maximum sequence length for translation
+        compile_model (bool): Whether the model forward is compiled with a static KV cache
+        merge_adapter (bool): Whether the LoRA adapter is folded into the base weights
     """
     
-    def __init__(self, peft_model_path: str = "ducmai-4203/envit5-medev-vi2en", max_length: int = 512):
+    def __init__(self, peft_model_path: str = "ducmai-4203/envit5-medev-vi2en", max_length: int = 512,
+                 compile_model: bool = False, merge_adapter: bool = True):
         """
         Initialize the EnViT5 translator.
         
         Args:
             peft_model_path (str): Path to the PEFT model
             max_length (int): Maximum sequence length for translation
+            compile_model (bool): Compile the model forward with torch.compile and decode
+                with a static KV cache (CUDA only)
+            merge_adapter (bool): Merge the LoRA adapter into the base weights so
+                generation runs a plain seq2seq model without the extra adapter matmuls
         """
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.max_length = max_length
+        self.compile_model = compile_model and self.device == "cuda"
+        self._buckets = [b for b in SEQ_BUCKETS if b < max_length] + [max_length]
         
         try:
             # Load base model
             logger.info("Loading base model...")
-            self.base_model = AutoModelForSeq2SeqLM.from_pretrained("VietAI/envit5-translation")
-            self.base_model = self.base_model.to(self.device).half()
+            # Weights are loaded straight to FP16 on the target device, without an FP32 copy
+            self.base_model = AutoModelForSeq2SeqLM.from_pretrained(
+                "VietAI/envit5-translation",
+                torch_dtype=torch.float16,
+                low_cpu_mem_usage=True,
+                device_map=self.device
+            )
             
-            # Load PEFT model
+            # Load PEFT model (adapter weights keep the FP16 dtype of the base layers)
             logger.info("Loading PEFT model...")
             self.model = PeftModel.from_pretrained(
                 self.base_model,
-                peft_model_path
-            ).to(self.device).half()
+                peft_model_path,
+                autocast_adapter_dtype=False
+            )
+            
+            if merge_adapter:
+                # Fold the LoRA weights into the dense layers; the result is the plain base model
+                logger.info("Merging PEFT adapter into base model...")
+                self.model = self.model.merge_and_unload()
+                self.base_model = self.model
             
             # Load tokenizer
             logger.info("Loading tokenizer...")
             self.tokenizer = AutoTokenizer.from_pretrained("VietAI/envit5-translation")
             
+            # Set generation defaults once instead of passing them on every call
+            generation_config = self.base_model.generation_config
+            generation_config.max_length = self.max_length
+            generation_config.num_beams = 2
+            generation_config.early_stopping = True
+            generation_config.use_cache = True
+            
+            if self.compile_model:
+                self._compile()
+            
             logger.info("Model initialization completed successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize the model: {str(e)}")
             raise
     
+    def _compile(self):
+        """
+        Compile the forward pass of the underlying seq2seq model.
+        
+        generate() calls the base model's forward once per decoding step, so that is
+        what gets compiled; the static KV cache keeps its shapes fixed across steps.
+        """
+        logger.info("Compiling model forward with torch.compile...")
+        self.base_model.generation_config.cache_implementation = "static"
+        self.base_model.forward = torch.compile(
+            self.base_model.forward,
+            mode="reduce-overhead",
+            fullgraph=False
+        )
+    
+    def _bucket_length(self, length: int) -> int:
+        """Return the smallest sequence bucket that fits length tokens."""
+        for bucket in self._buckets:
+            if length <= bucket:
+                return bucket
+        return self._buckets[-1]
+    
+    def _to_device(self, encodings):
+        """
+        Move tokenizer outputs to the model device.
+        
+        On CUDA the tensors are pinned first so the host-to-device copies are
+        asynchronous; generate() runs on the same stream, so it is still ordered
+        after them.
+        """
+        if self.device != "cuda":
+            return encodings.to(self.device)
+        return {
+            key: tensor.pin_memory().to(self.device, non_blocking=True)
+            for key, tensor in encodings.items()
+        }
+    
+    def _tokenize(self, texts: List[str]):
+        """
+        Tokenize texts for generation, padding to a length bucket when compiled.
+        """
+        if not self.compile_model:
+            return self._to_device(self.tokenizer(
+                texts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_length
+            ))
+        
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        longest = max(len(ids) for ids in encodings["input_ids"])
+        return self._to_device(self.tokenizer.pad(
+            encodings,
+            padding="max_length",
+            max_length=self._bucket_length(longest),
+            return_tensors="pt"
+        ))
+    
     def translate(self, text: Union[str, List[str]]) -> Union[str, List[str]]:
         """
         Translate text from Vietnamese to English, with automatic language detection.
@@ -72,47 +193,21 @@ class EnViT5Translator:
             is_single_string = isinstance(text, str)
             texts = [text] if is_single_string else text
             
-            # Process each text
-            texts_to_translate = []
-            indices_to_translate = []
-            result = [""] * len(texts)
+            # Classify every text first; pure English texts are kept as is
+            result = list(texts)
+            indices_to_translate = [i for i, t in enumerate(texts) if _needs_translation(t)]
             
-            # Check each text for language and prepare for translation if needed
-            for i, t in enumerate(texts):
-                try:
-                    # Try to detect language
-                    lang = detect(t)
-                    # If pure English, keep original
-                    if lang == 'en':
-                        result[i] = t
-                    else:
-                        # Vietnamese or mixed content needs translation
-                        texts_to_translate.append(f"vi: {t}")
-                        indices_to_translate.append(i)
-                except:
-                    # If detection fails, assume it needs translation
-                    texts_to_translate.append(f"vi: {t}")
-                    indices_to_translate.append(i)
+            # Vietnamese or mixed content is translated in a single batch
+            texts_to_translate = [f"vi: {texts[i]}" for i in indices_to_translate]
             
             # If we have texts to translate
             if texts_to_translate:
                 # Tokenize
-                inputs = self.tokenizer(
-                    texts_to_translate,
-                    return_tensors="pt",
-                    padding=True,
-                    truncation=True,
-                    max_length=self.max_length
-                ).to(self.device)
+                inputs = self._tokenize(texts_to_translate)
                 
-                # Generate translation
+                # Generate translation (max_length, num_beams, early_stopping come from the generation config)
                 with torch.inference_mode():
-                    outputs = self.model.generate(
-                        **inputs,
-                        max_length=self.max_length,
-                        num_beams=2,
-                        early_stopping=True
-                    )
+                    outputs = self.model.generate(**inputs)
                 
                 # Decode outputs and put them in the right positions
                 translations = [
@@ -1,25 +1,56 @@
+import diskcache
+import numpy as np
 import requests
-from langdetect import detect
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# Số luồng tải song song các trang quan hệ (cũng là kích thước connection pool)
+FETCH_WORKERS = 8
+# Dữ liệu UMLS gần như bất biến với một version nên giữ trong cache 30 ngày
+CACHE_EXPIRE = 86400 * 30
 
 class UMLS_API:
-    def __init__(self, apikey, version="current"):
+    def __init__(self, apikey, version="current", cache_dir=".umls_cache", cache_expire=CACHE_EXPIRE):
         self.apikey = apikey
         self.version = version
         self.search_url = f"https://uts-ws.nlm.nih.gov/rest/search/{version}"
         self.content_url = f"https://uts-ws.nlm.nih.gov/rest/content/{version}"
         self.content_suffix = "/CUI/{}/{}?apiKey={}"
 
+        # Một session dùng chung để giữ kết nối keep-alive giữa các request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+        self.session.mount("https://", adapter)
+
+        # Cache trên đĩa cho các phản hồi JSON, khóa theo (version, cui/query, loại, trang); tắt khi cache_dir=None
+        self.cache = diskcache.Cache(cache_dir) if cache_dir else None
+        self.cache_expire = cache_expire
+
+    def _get_json(self, key, url, params=None):
+        # Trả về JSON từ cache nếu có, nếu không thì gọi API và lưu lại (chỉ lưu phản hồi thành công)
+        key = (self.version,) + key
+        if self.cache is not None:
+            outputs = self.cache.get(key)
+            if outputs is not None:
+                return outputs
+
+        r = self.session.get(url, params=params)
+        r.raise_for_status()
+        r.encoding = "utf-8"
+        outputs = r.json()
+
+        if self.cache is not None:
+            self.cache.set(key, outputs, expire=self.cache_expire)
+        return outputs
+
     def search_cui(self, query, page_size=10, max_pages=5):
         cui_results = []
 
         try:
             page = 1
             size = 1
-            query = {"string": query, "apiKey": self.apikey, "pageNumber": page, "pageSize": size}
-            r = requests.get(self.search_url, params=query)
-            r.raise_for_status()
-            r.encoding = 'utf-8'
-            outputs = r.json()
+            params = {"string": query, "apiKey": self.apikey, "pageNumber": page, "pageSize": size}
+            outputs = self._get_json((query, "search", page, size), self.search_url, params=params)
 
             items = outputs["result"]["results"]
 
@@ -37,10 +68,7 @@ class UMLS_API:
     def get_definitions(self, cui):
         try:
             suffix = self.content_suffix.format(cui, "definitions", self.apikey)
-            r = requests.get(self.content_url + suffix)
-            r.raise_for_status()
-            r.encoding = "utf-8"
-            outputs = r.json()
+            outputs = self._get_json((cui, "definitions", None), self.content_url + suffix)
 
             return outputs["result"]
         except Exception as except_error:
@@ -48,49 +76,47 @@ class UMLS_API:
 
     @staticmethod
     def remove_duplicate_umls(kg_triples):
-        normalized_triples = set()
-        result = []
-        
-        for triple in kg_triples:
-            # Normalize by converting to lowercase and handling None values
-            normalized = {
-                'relatedFromIdName': triple.get('relatedFromIdName', '').lower(),
-                'additionalRelationLabel': triple.get('additionalRelationLabel', '').lower(),
-                'relatedIdName': triple.get('relatedIdName', '').lower()
-            }
-            
-            # Create tuple for comparison (immutable for set)
-            normalized_tuple = (
-                normalized['relatedFromIdName'],
-                normalized['additionalRelationLabel'],
-                normalized['relatedIdName']
-            )
-            
-            # Only add if we haven't seen this normalized form before
-            if normalized_tuple not in normalized_triples:
-                normalized_triples.add(normalized_tuple)
-                result.append(triple)
-            
-        return result
+        if not kg_triples:
+            return []
+
+        # Ghép ba trường thành một khóa duy nhất (ngăn cách bằng \x1f) và hạ chữ thường một lần.
+        # Không dùng np.char.lower vì nó cắt cụt chuỗi khi chữ thường dài hơn (vd. "İ")
+        keys = np.array([
+            (triple.get('relatedFromIdName', '') + "\x1f" + triple.get('additionalRelationLabel', '') + "\x1f" + triple.get('relatedIdName', '')).lower()
+            for triple in kg_triples
+        ])
+
+        # return_index cho vị trí xuất hiện đầu tiên; sắp xếp lại để giữ thứ tự ban đầu
+        _, idx = np.unique(keys, return_index=True)
+        return [kg_triples[i] for i in np.sort(idx)]
+
+    def _fetch_page(self, cui, page):
+        suffix = self.content_suffix.format(cui, "relations", self.apikey) + f"&pageNumber={page}&sabs=SNOMEDCT_US,MSH,ICD10CM,LNC,RXNORM,CPT,NCI,HL7V2.5"
+        outputs = self._get_json((cui, "relations", page), self.content_url + suffix)
+
+        return outputs.get("result", [])
 
     def get_relations(self, cui, pages=25, language="ENG"):
         all_relations = []
 
-        try:
-            for page in range(1, pages + 1):
-                suffix = self.content_suffix.format(cui, "relations", self.apikey) + f"&pageNumber={page}&sabs=SNOMEDCT_US,MSH,ICD10CM,LNC,RXNORM,CPT,NCI,HL7V2.5"
-                r = requests.get(self.content_url + suffix)
-                r.raise_for_status()
-                r.encoding = "utf-8"
-                outputs = r.json()
+        # Kết quả đã khử trùng lặp cũng được cache để bỏ qua cả bước ghép các trang
+        dedup_key = (self.version, cui, "dedup_rels", pages)
+        if self.cache is not None:
+            cached = self.cache.get(dedup_key)
+            if cached is not None:
+                return cached
 
-                page_relations = outputs.get("result", [])
-                all_relations.extend(page_relations)
+        try:
+            # Tải các trang song song; map giữ nguyên thứ tự trang
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                for page_relations in executor.map(lambda page: self._fetch_page(cui, page), range(1, pages + 1)):
+                    all_relations.extend(page_relations)
 
             rels = []
             for rel in all_relations:
                 related_from = rel.get("relatedFromIdName", "").strip()
-                relation_label = rel.get("additionalRelationLabel", "")
+                # Chuẩn hóa nhãn quan hệ một lần khi tải (vd. "may_be_treated_by" -> "may be treated by")
+                relation_label = rel.get("additionalRelationLabel", "").replace("_", " ")
                 related_to = rel.get("relatedIdName", "")
 
                 triplet = {
@@ -104,6 +130,8 @@ class UMLS_API:
             
             rels = UMLS_API.remove_duplicate_umls(rels)
 
+            if self.cache is not None:
+                self.cache.set(dedup_key, rels, expire=self.cache_expire)
             return rels
             
         except Exception as except_error:
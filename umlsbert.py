@@ -1,43 +1,131 @@
 from transformers import AutoTokenizer, AutoModel
 import torch
 import numpy as np
+import logging
+import os
+from cache import LRUCache
 
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bản export ONNX dùng lại giữa các lần chạy
+ONNX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "umlsbert", "model.onnx")
 
 class UMLSBERT:
-    # def __init__(self):
-    #     self.tokenizer = AutoTokenizer.from_pretrained("GanjinZero/UMLSBert_ENG")
-    #     self.model = AutoModel.from_pretrained("GanjinZero/UMLSBert_ENG")
-
-    # def mean_pooling(self, model_output, attention_mask):
-    #     token_embeddings = model_output[0]  
-    #     input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    #     return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
-
-    # def batch_encode(self, texts, batch_size=16):
-    #     all_embeddings = []
-    #     for i in range(0, len(texts), batch_size):
-    #         batch_texts = texts[i:i+batch_size]
-    #         inputs = self.tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
-    #         with torch.no_grad():
-    #             model_output = self.model(**inputs)
-    #             attention_mask = inputs["attention_mask"]
-    #             batch_embeddings = self.mean_pooling(model_output, attention_mask)
-    #         all_embeddings.extend(batch_embeddings)  
-    #     return np.array(all_embeddings)
-    
-    def __init__(self):
+    def __init__(self, device=None, use_onnx=None, cache_size=100000):
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
         self.tokenizer = AutoTokenizer.from_pretrained("GanjinZero/UMLSBert_ENG")
-        self.model = AutoModel.from_pretrained("GanjinZero/UMLSBert_ENG")
+        self.model = AutoModel.from_pretrained("GanjinZero/UMLSBert_ENG").to(self.device).eval()
+        # FP16 trên GPU để dùng tensor core
+        if self.device == "cuda":
+            self.model = self.model.half()
+
+        # Trên CPU mặc định chạy ONNX Runtime (nếu có) với tối ưu đồ thị đầy đủ
+        if use_onnx is None:
+            use_onnx = ort is not None and self.device == "cpu"
+        if use_onnx and self.device != "cpu":
+            logger.warning("ONNX Runtime encoding is only supported on CPU, using PyTorch")
+            use_onnx = False
+        self.session = self._load_onnx() if use_onnx else None
+
+        # Embedding theo (text, max_length): câu hỏi và bộ ba lặp lại giữa các ranker không phải mã hóa lại
+        self._cache = LRUCache(cache_size)
+
+    def _load_onnx(self, path=ONNX_PATH):
+        try:
+            if not os.path.exists(path):
+                logger.info(f"Exporting UMLSBERT to ONNX at {path}")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                dummy = self.tokenizer(["umls"], return_tensors="pt")
+                torch.onnx.export(
+                    self.model,
+                    (dummy["input_ids"], dummy["attention_mask"]),
+                    path,
+                    input_names=["input_ids", "attention_mask"],
+                    output_names=["last_hidden_state"],
+                    dynamic_axes={
+                        "input_ids": {0: "batch", 1: "sequence"},
+                        "attention_mask": {0: "batch", 1: "sequence"},
+                        "last_hidden_state": {0: "batch", 1: "sequence"}
+                    },
+                    opset_version=17
+                )
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            logger.warning(f"ONNX Runtime unavailable for UMLSBERT, using PyTorch: {str(e)}")
+            return None
 
-    def batch_encode(self, texts, batch_size=16):
+    def mean_pooling(self, model_output, attention_mask):
+        # Trung bình theo attention mask để token padding không làm lệch embedding
+        token_embeddings = model_output[0]
+        input_mask_expanded = attention_mask.unsqueeze(-1).to(token_embeddings.dtype)
+        summed = torch.sum(token_embeddings * input_mask_expanded, 1)
+        return summed / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+
+    def batch_encode(self, texts, batch_size=16, max_length=512):
+        if not texts:
+            return np.array([])
+
+        # Chỉ chạy mô hình cho các chuỗi chưa có trong cache (mỗi chuỗi một lần)
+        embeddings = [self._cache.get((text, max_length)) for text in texts]
+        misses = list(dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None))
+        if misses:
+            encoded = dict(zip(misses, self._encode(misses, batch_size, max_length)))
+            for text, emb in encoded.items():
+                self._cache.set((text, max_length), emb)
+            embeddings = [encoded[text] if emb is None else emb for text, emb in zip(texts, embeddings)]
+        return np.stack(embeddings)
+
+    def cache_stats(self):
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _encode(self, texts, batch_size, max_length):
+        # Sắp xếp theo độ dài để mỗi batch gồm các câu dài gần bằng nhau (ít padding), rồi trả về thứ tự gốc
+        if len(texts) > batch_size:
+            order = np.argsort([len(text) for text in texts], kind="stable")
+            embeddings = self._encode_batches([texts[i] for i in order], batch_size, max_length)
+            return embeddings[np.argsort(order)]
+        return self._encode_batches(texts, batch_size, max_length)
+
+    def _encode_batches(self, texts, batch_size, max_length):
         all_embeddings = []
         for i in range(0, len(texts), batch_size):
             batch_texts = texts[i:i+batch_size]
-            inputs = self.tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
-            with torch.no_grad():
+            if self.session is not None:
+                all_embeddings.append(self._encode_onnx(batch_texts, max_length))
+                continue
+            inputs = self.tokenizer(batch_texts, return_tensors="pt", padding="longest", truncation=True, max_length=max_length)
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.inference_mode(), torch.autocast(
+                device_type="cuda", dtype=torch.float16, enabled=self.device == "cuda"
+            ):
                 outputs = self.model(**inputs)
-            batch_embeddings = outputs.last_hidden_state.mean(dim=1).detach().numpy()
-            all_embeddings.extend(batch_embeddings)
-        return np.array(all_embeddings)
+                batch_embeddings = self.mean_pooling(outputs, inputs["attention_mask"])
+            all_embeddings.append(batch_embeddings.float().cpu().numpy())
+        return np.concatenate(all_embeddings)
+
+    def _encode_onnx(self, batch_texts, max_length=512):
+        inputs = self.tokenizer(batch_texts, return_tensors="np", padding="longest", truncation=True, max_length=max_length)
+        attention_mask = inputs["attention_mask"].astype(np.int64)
+        token_embeddings = self.session.run(None, {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": attention_mask
+        })[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
     
 # umlsbert = UMLSBERT()
\ No newline at end of file